@@ -0,0 +1,55 @@
+# Per-message cost of the bad word filter as the word list grows.
+# Run from the repo root: python benchmarks/bench_moderation.py
+import os
+import random
+import string
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from moderation import WordFilter, normalize
+
+SIZES = [10, 100, 1000, 10000, 50000]
+MESSAGES = [
+    "hey froggy what's up, did you see the game last night?",
+    "I think the new pond by the old mill is the best place to hang out on weekends",
+    "lol",
+    "can someone help me with my homework? it's about frogs and their life cycle " * 3,
+]
+ROUNDS = 2000
+
+
+def random_words(n, seed=42):
+    rng = random.Random(seed)
+    return ["".join(rng.choices(string.ascii_lowercase, k=rng.randint(5, 12))) for _ in range(n)]
+
+
+def naive_contains(words, text):
+    text_lower = text.lower()
+    return any(word in text_lower for word in words)
+
+
+def per_message_us(check):
+    started = time.perf_counter()
+    for _ in range(ROUNDS):
+        for msg in MESSAGES:
+            check(msg)
+    return (time.perf_counter() - started) / (ROUNDS * len(MESSAGES)) * 1e6
+
+
+def main():
+    print(f"{'words':>8} {'build ms':>10} {'automaton us/msg':>18} {'naive scan us/msg':>18}")
+    for size in SIZES:
+        words = random_words(size)
+        started = time.perf_counter()
+        word_filter = WordFilter(words)
+        build_ms = (time.perf_counter() - started) * 1000
+        automaton = per_message_us(word_filter.contains)
+        normalized = [normalize(w) for w in words]
+        naive = per_message_us(lambda msg: naive_contains(normalized, msg)) if size <= 10000 else float('nan')
+        print(f"{size:>8} {build_ms:>10.1f} {automaton:>18.2f} {naive:>18.2f}")
+
+
+if __name__ == "__main__":
+    main()
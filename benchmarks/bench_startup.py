@@ -0,0 +1,79 @@
+# How long `import froggy_bot` takes in a fresh interpreter, checked against
+# the import-time budget, with the slowest modules from `python -X importtime`.
+# Run from the repo root: python benchmarks/bench_startup.py
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def import_once(env):
+    # importtime writes one line per module to stderr: self us | cumulative us | name
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import froggy_bot'],
+        cwd=ROOT, env=env, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+    modules = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        parts = line[len('import time:'):].split('|')
+        if len(parts) != 3 or not parts[1].strip().isdigit():
+            continue
+        name = parts[2].rstrip()
+        modules.append((int(parts[1]) / 1e6, len(name) - len(name.lstrip()), name.strip()))
+    total = next(seconds for seconds, _, name in modules if name == 'froggy_bot')
+    return total, modules
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import-time check for froggy_bot")
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--top', type=int, default=10, help="Slowest top-level imports to list")
+    parser.add_argument('--budget', type=float, help="Seconds allowed (default: froggy_bot.IMPORT_BUDGET)")
+    args = parser.parse_args()
+
+    env = dict(os.environ)
+    env.setdefault('DISCORD_TOKEN', 'bench-token')
+    env.setdefault('GEMINI_API_KEY', 'bench-key')
+    env['FROGGY_METRICS_PORT'] = '0'
+    # Importing shouldn't touch these, but keep them out of the repo if it ever does
+    workdir = tempfile.mkdtemp(prefix='froggy-startup-')
+    env['FROGGY_MEMORY_DB'] = os.path.join(workdir, 'memory.db')
+    env['FROGGY_CONFIG_DB'] = os.path.join(workdir, 'config.db')
+
+    totals = []
+    modules = []
+    for _ in range(args.runs):
+        total, modules = import_once(env)
+        totals.append(total)
+
+    budget = args.budget
+    if budget is None:
+        sys.path.insert(0, ROOT)
+        os.environ.update(env)
+        import froggy_bot
+        budget = froggy_bot.IMPORT_BUDGET
+
+    median = statistics.median(totals)
+    print(f"import froggy_bot: median {median * 1000:.1f} ms over {args.runs} runs "
+          f"(min {min(totals) * 1000:.1f}, max {max(totals) * 1000:.1f}); budget {budget * 1000:.0f} ms")
+    # Direct imports of froggy_bot are one level deeper than froggy_bot itself
+    depth = next(indent for _, indent, name in modules if name == 'froggy_bot') + 2
+    direct = sorted((m for m in modules if m[1] == depth), reverse=True)[:args.top]
+    print(f"\n{'module':<40}{'cumulative ms':>14}")
+    for seconds, _, name in direct:
+        print(f"{name:<40}{seconds * 1000:>14.1f}")
+    if median > budget:
+        print("\nOver budget")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,521 @@
+# Offline load test for froggy_bot.py. Replays synthetic traffic through the
+# real on_message, idle check-ins and slash command handlers against a fake
+# Discord gateway and a stub Gemini model, then reports reply latency,
+# throughput, event-loop lag and memory use. No tokens or network needed.
+#
+#   python benchmarks/load_test.py --guilds 50 --channels 5 --rate 200 --duration 30
+#   python benchmarks/load_test.py --latency 2.0 --no-stream --json results.json
+#   python benchmarks/load_test.py --shards 2   # one process per shard, like froggy_launcher.py
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import random
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+_ids = itertools.count(1_000_000)
+SHARD_ID_SPACING = 100_000_000  # Keeps fake IDs from different shard processes apart
+BENCH_APPLICATION_ID = 42
+
+SAMPLE_MESSAGES = [
+    "anyone up for some games tonight?",
+    "lol that's hilarious",
+    "I just finished my homework finally",
+    "what's everyone doing this weekend",
+    "did you see the new trailer?",
+    "brb getting food",
+]
+SAMPLE_MENTIONS = [
+    "hi froggy!",
+    "hey froggy what's up",
+    "froggy, do you remember what I said about my project?",
+    "what's your favorite pond?",
+    "tell me something fun froggy",
+]
+
+
+# --- Stub Gemini -----------------------------------------------------------
+
+class StubChunk:
+    def __init__(self, text):
+        self.text = text
+
+
+class StubStream:
+    def __init__(self, chunks, delay):
+        self.chunks = chunks
+        self.delay = delay
+
+    async def __aiter__(self):
+        for chunk in self.chunks:
+            await asyncio.sleep(self.delay)
+            yield StubChunk(chunk)
+
+
+class StubModel:
+    # Async-only model with configurable latency; replies are canned
+    def __init__(self, latency, jitter, chunks, rng):
+        self.latency = latency
+        self.jitter = jitter
+        self.chunks = chunks
+        self.rng = rng
+        self.calls = 0
+
+    def _delay(self):
+        return max(0.0, self.rng.gauss(self.latency, self.jitter))
+
+    async def generate_content_async(self, prompt, stream=False, **kwargs):
+        self.calls += 1
+        text = "Ribbit! That sounds like a splash of fun, tell me more about it!"
+        if stream:
+            words = text.split(" ")
+            size = max(1, len(words) // self.chunks)
+            parts = [" ".join(words[i:i + size]) + " " for i in range(0, len(words), size)]
+            return StubStream(parts, self._delay() / len(parts))
+        await asyncio.sleep(self._delay())
+        return StubChunk(text)
+
+
+# --- Fake Discord ----------------------------------------------------------
+
+class FakeUser:
+    def __init__(self, name, bot=False):
+        self.id = next(_ids)
+        self.name = name
+        self.display_name = name
+        self.bot = bot
+        self.mention = f"<@{self.id}>"
+
+    def mentioned_in(self, message):
+        return any(user.id == self.id for user in message.mentions)
+
+    async def send(self, content=None, **kwargs):
+        return None
+
+
+class FakeGuild:
+    def __init__(self, name):
+        self.id = next(_ids)
+        self.name = name
+        self.me = None  # Froggy's member object; only passed to permissions_for
+
+
+class _Permissions:
+    send_messages = True
+
+
+_CAN_SEND = _Permissions()
+
+
+class _Typing:
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+class FakeChannel:
+    def __init__(self, guild, stats, send_latency):
+        self.id = next(_ids)
+        self.guild = guild
+        self.name = f"chan-{self.id}"
+        self.stats = stats
+        self.send_latency = send_latency
+        self.unanswered = []  # Mention timestamps waiting for a reply
+
+    def typing(self):
+        return _Typing()
+
+    def permissions_for(self, member):
+        return _CAN_SEND
+
+    async def send(self, content=None, embed=None, **kwargs):
+        await asyncio.sleep(self.send_latency)
+        self.stats.record_send(self)
+        return FakeMessage(content or "", self.stats.froggy, self, [])
+
+
+class FakeMessage:
+    def __init__(self, content, author, channel, mentions):
+        self.id = next(_ids)
+        self.content = content
+        self.author = author
+        self.channel = channel
+        self.guild = channel.guild
+        self.mentions = mentions
+        self.mention_everyone = False
+        self.created = time.perf_counter()
+
+    async def reply(self, content=None, **kwargs):
+        return await self.channel.send(content)
+
+    async def edit(self, content=None, **kwargs):
+        await asyncio.sleep(self.channel.send_latency)
+        self.content = content
+        self.channel.stats.edits += 1
+        return self
+
+    async def add_reaction(self, emoji):
+        await asyncio.sleep(self.channel.send_latency)
+
+
+class FakeResponse:
+    def __init__(self, stats):
+        self.stats = stats
+
+    async def send_message(self, content=None, **kwargs):
+        self.stats.command_replies += 1
+
+
+class FakeTree:
+    # Stands in for CommandTree.sync, which would call the Discord API
+    def __init__(self, tree):
+        self.tree = tree
+        self.global_syncs = 0
+        self.guild_syncs = 0
+
+    async def sync(self, guild=None):
+        await asyncio.sleep(0.01)
+        if guild is None:
+            self.global_syncs += 1
+        else:
+            self.guild_syncs += 1
+        return self.tree.get_commands(guild=guild)
+
+
+class FakeInteraction:
+    def __init__(self, user, channel, stats):
+        self.user = user
+        self.channel = channel
+        self.guild = channel.guild
+        self.response = FakeResponse(stats)
+
+
+# --- Stats -----------------------------------------------------------------
+
+class Stats:
+    def __init__(self, froggy):
+        self.froggy = froggy
+        self.latencies = []
+        self.handler_seconds = []
+        self.loop_lag = []
+        self.sends = 0
+        self.edits = 0
+        self.mentions = 0
+        self.messages = 0
+        self.commands = 0
+        self.command_replies = 0
+        self.other_sends = 0
+        self.started = time.perf_counter()
+
+    def record_send(self, channel):
+        self.sends += 1
+        now = time.perf_counter()
+        if channel.unanswered:
+            # A reply answers every mention that was waiting, which is how
+            # merged replies to a burst get counted
+            self.latencies.extend(now - sent for sent in channel.unanswered)
+            channel.unanswered.clear()
+        else:
+            # Idle check-ins, /annoy and other sends nobody is waiting on
+            self.other_sends += 1
+
+
+def percentile(values, pct):
+    if not values:
+        return float('nan')
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def rss_mb():
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2**20
+    except OSError:
+        # ru_maxrss is KB on Linux and bytes on macOS; good enough as a fallback
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 2**20 if sys.platform == 'darwin' else peak / 1024
+
+
+async def watch_lag(stats, interval=0.05):
+    while True:
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        stats.loop_lag.append(max(0.0, time.perf_counter() - started - interval))
+
+
+# --- Driver ----------------------------------------------------------------
+
+def load_bot(args):
+    # froggy_bot reads its settings at import and opens its stores in
+    # create_app(), so point them somewhere harmless. Shard processes share
+    # one directory, the way shard processes share a deployment's files
+    workdir = args.workdir or tempfile.mkdtemp(prefix='froggy-bench-')
+    if args.shard_id is not None:
+        os.environ['FROGGY_SHARD_COUNT'] = str(args.shards)
+        os.environ['FROGGY_SHARD_IDS'] = str(args.shard_id)
+    os.environ.setdefault('DISCORD_TOKEN', 'bench-token')
+    os.environ.setdefault('GEMINI_API_KEY', 'bench-key')
+    os.environ['FROGGY_MEMORY_DB'] = os.path.join(workdir, 'memory.db')
+    os.environ['FROGGY_CONFIG_DB'] = os.path.join(workdir, 'config.db')
+    os.environ['FROGGY_COMMAND_SYNC_STATE'] = os.path.join(workdir, 'sync.json')
+    os.environ['FROGGY_STATE_SNAPSHOT'] = os.path.join(workdir, 'state.bin')
+    os.environ['FROGGY_METRICS_PORT'] = '0'
+    os.environ.setdefault('FROGGY_LOG_LEVEL', 'WARNING')
+    import froggy_bot
+    froggy_bot.create_app()
+    return froggy_bot
+
+
+async def start_shard(fb, guilds):
+    # What logging in and on_ready do for a shard process: setup_hook syncs
+    # global commands (only on the shard 0 process), then the shard's own
+    # guilds are synced, both against the shared sync state file
+    fake_tree = FakeTree(fb.bot.tree)
+    fb.bot.tree.sync = fake_tree.sync
+    fb.bot._connection.application_id = BENCH_APPLICATION_ID
+    await fb.bot.setup_hook()
+    await fb.bot.command_syncer.sync_guilds(BENCH_APPLICATION_ID, guilds)
+    return fake_tree
+
+
+async def run(args):
+    global _ids
+    rng = random.Random(args.seed if args.shard_id is None else args.seed + args.shard_id)
+    if args.shard_id is not None:
+        _ids = itertools.count(1_000_000 + args.shard_id * SHARD_ID_SPACING)
+    fb = load_bot(args)
+
+    froggy = FakeUser("Froggy", bot=True)
+    stats = Stats(froggy)
+    fb.bot._connection.user = froggy
+    FakeMessage._state = fb.bot._connection  # commands.Context reads this
+    fb.gemini.fast.model = StubModel(args.latency, args.latency_jitter, args.chunks, rng)
+    fb.gemini.strong.model = StubModel(args.strong_latency, args.latency_jitter, args.chunks, rng)
+    fb.STREAM_REPLIES = args.stream
+    fb.idle_channels.jitter = 0
+    fb.response_cache.warm()  # on_ready's warm-up, which the fake gateway never triggers
+
+    guild_count = args.guilds if args.shard_id is None else max(1, args.guilds // args.shards)
+    guilds = [FakeGuild(f"guild-{g}") for g in range(guild_count)]
+    channels = [FakeChannel(guild, stats, args.send_latency) for guild in guilds for _ in range(args.channels)]
+    users = [FakeUser(f"friend{u}") for u in range(args.users)]
+    for guild in guilds:
+        # Through the store, so check-ins read the cooldown from a guild's saved settings
+        fb.guild_config.set(guild.id, 'interaction_cooldown', args.idle_cooldown)
+    by_id = {channel.id: channel for channel in channels}
+    fb.bot.get_channel = by_id.get  # The fake gateway's channel cache
+
+    fake_tree = await start_shard(fb, guilds) if args.shard_id is not None else None
+
+    lag_task = asyncio.create_task(watch_lag(stats))
+    idle_task = asyncio.create_task(fb.random_interactions())
+    handlers = set()
+
+    async def deliver(message):
+        started = time.perf_counter()
+        await fb.on_message(message)
+        stats.handler_seconds.append(time.perf_counter() - started)
+
+    async def slash_command(channel, user):
+        interaction = FakeInteraction(user, channel, stats)
+        choice = rng.random()
+        if choice < 0.4:
+            await fb.joke.callback(interaction)
+        elif choice < 0.7:
+            await fb.fact.callback(interaction)
+        else:
+            await fb.annoy.callback(interaction, rng.choice(users), rng.randint(1, 5))
+
+    print(f"Replaying {args.rate} msg/s for {args.duration}s across "
+          f"{len(guilds)} guilds / {len(channels)} channels / {len(users)} users...")
+    started = time.perf_counter()
+    deadline = started + args.duration
+    while time.perf_counter() < deadline:
+        await asyncio.sleep(rng.expovariate(args.rate))
+        channel = rng.choice(channels)
+        user = rng.choice(users)
+        roll = rng.random()
+        if roll < args.command_ratio:
+            stats.commands += 1
+            task = asyncio.create_task(slash_command(channel, user))
+        else:
+            stats.messages += 1
+            if roll < args.command_ratio + args.mention_ratio:
+                stats.mentions += 1
+                content = f"{froggy.mention} {rng.choice(SAMPLE_MENTIONS)}"
+                message = FakeMessage(content, user, channel, [froggy])
+                channel.unanswered.append(message.created)
+            else:
+                message = FakeMessage(rng.choice(SAMPLE_MESSAGES), user, channel, [])
+            task = asyncio.create_task(deliver(message))
+        handlers.add(task)
+        task.add_done_callback(handlers.discard)
+    elapsed = time.perf_counter() - started
+
+    # Let in-flight replies finish
+    drain_deadline = time.perf_counter() + args.drain
+    while time.perf_counter() < drain_deadline and (
+            handlers or fb.mention_queue.pending_count() or fb.outbound.pending() or fb.gemini.in_flight):
+        await asyncio.sleep(0.1)
+
+    for task in (lag_task, idle_task):
+        task.cancel()
+    await asyncio.gather(lag_task, idle_task, return_exceptions=True)
+
+    # Shut down the way SIGTERM would and check what the snapshot kept
+    shutdown_started = time.perf_counter()
+    await fb.shutdown_bot('load test')
+    shutdown_seconds = time.perf_counter() - shutdown_started
+    _, snapshot = fb.state_snapshot.load(fb.SNAPSHOT_PATH)
+
+    unanswered = sum(len(channel.unanswered) for channel in channels)
+    sharding = None
+    if fake_tree is not None:
+        sharding = {
+            'shard_id': args.shard_id,
+            'auto_sharded': isinstance(fb.bot, fb.commands.AutoShardedBot),
+            'shard_ids': fb.bot.shard_ids,
+            'shard_count': fb.bot.shard_count,
+            'primary': fb.IS_PRIMARY_SHARD,
+            'global_syncs': fake_tree.global_syncs,
+            'guild_syncs': fake_tree.guild_syncs,
+            'guilds': [guild.id for guild in guilds],
+            'snapshot_path': fb.SNAPSHOT_PATH,
+        }
+    return {
+        'config': vars(args),
+        'sharding': sharding,
+        'messages': stats.messages,
+        'mentions': stats.mentions,
+        'commands': stats.commands,
+        'replies_answered': len(stats.latencies),
+        'mentions_unanswered': unanswered,
+        'mentions_dropped': fb.mention_queue.dropped,
+        'gemini_calls': fb.gemini.fast.model.calls + fb.gemini.strong.model.calls,
+        'model_routing': fb.gemini.stats(),
+        'discord_sends': stats.sends,
+        'discord_edits': stats.edits,
+        'other_sends': stats.other_sends,
+        'throughput_replies_per_s': round(len(stats.latencies) / elapsed, 2),
+        'reply_latency_p50_s': round(percentile(stats.latencies, 50), 3),
+        'reply_latency_p99_s': round(percentile(stats.latencies, 99), 3),
+        'handler_us_mean': round(statistics.fmean(stats.handler_seconds) * 1e6, 1) if stats.handler_seconds else None,
+        'handler_us_p99': round(percentile(stats.handler_seconds, 99) * 1e6, 1),
+        'loop_lag_ms_p50': round(percentile(stats.loop_lag, 50) * 1000, 2),
+        'loop_lag_ms_p99': round(percentile(stats.loop_lag, 99) * 1000, 2),
+        'loop_lag_ms_max': round(max(stats.loop_lag, default=0) * 1000, 2),
+        'rss_mb': round(rss_mb(), 1),
+        'response_cache': fb.response_cache.stats(),
+        'rate_limits': fb.rate_limiter.stats(),
+        'shutdown_s': round(shutdown_seconds, 3),
+        'snapshot_bytes': os.path.getsize(fb.SNAPSHOT_PATH),
+        'snapshot_entries': {name: len(entries) for name, entries in snapshot.items() if entries},
+        'pipeline_stage_us_mean': {
+            dict(key)['stage']: round(series[-2] / series[-1] * 1e6, 1)
+            for key, series in fb.PIPELINE_SECONDS._series.items() if series[-1]
+        },
+    }
+
+
+def run_shards(args):
+    # One process per shard ID with FROGGY_SHARD_COUNT / FROGGY_SHARD_IDS set,
+    # as froggy_launcher.py runs them, sharing the databases, the command sync
+    # state and the snapshot directory. Checks that only shard 0 synced the
+    # global commands, every shard's guilds ended up in the shared sync state
+    # and each shard saved its own snapshot
+    workdir = tempfile.mkdtemp(prefix='froggy-bench-')
+    argv = list(sys.argv[1:])
+    if '--json' in argv:
+        del argv[argv.index('--json'):argv.index('--json') + 2]
+    procs = []
+    for shard_id in range(args.shards):
+        out = os.path.join(workdir, f'shard-{shard_id}.json')
+        cmd = [sys.executable, os.path.abspath(__file__), *argv,
+               '--shard-id', str(shard_id), '--workdir', workdir, '--json', out]
+        procs.append((shard_id, out, subprocess.Popen(cmd, cwd=ROOT)))
+    shards = []
+    for shard_id, out, proc in procs:
+        if proc.wait() != 0:
+            raise SystemExit(f"Shard {shard_id} exited with {proc.returncode}")
+        with open(out) as f:
+            shards.append(json.load(f))
+
+    with open(os.path.join(workdir, 'sync.json')) as f:
+        sync_state = json.load(f)
+    checks = {
+        'auto_sharded': all(shard['sharding']['auto_sharded'] for shard in shards),
+        'one_global_sync': [shard['sharding']['global_syncs'] for shard in shards] == [1] + [0] * (len(shards) - 1),
+        'only_shard_0_primary': [shard['sharding']['primary'] for shard in shards] == [True] + [False] * (len(shards) - 1),
+        'all_guilds_in_sync_state': all(
+            f"{BENCH_APPLICATION_ID}:{guild_id}" in sync_state
+            for shard in shards for guild_id in shard['sharding']['guilds']
+        ),
+        'global_in_sync_state': f"{BENCH_APPLICATION_ID}:global" in sync_state,
+        'separate_snapshots': len({shard['sharding']['snapshot_path'] for shard in shards}) == len(shards)
+            and all(os.path.exists(shard['sharding']['snapshot_path']) for shard in shards),
+    }
+
+    print()
+    for key in ('replies_answered', 'mentions_unanswered', 'reply_latency_p50_s', 'reply_latency_p99_s',
+                'throughput_replies_per_s', 'shutdown_s', 'snapshot_bytes'):
+        print(f"{key:>28}: " + "  ".join(f"[{shard['sharding']['shard_id']}] {shard[key]}" for shard in shards))
+    for key, ok in checks.items():
+        print(f"{key:>28}: {'ok' if ok else 'FAILED'}")
+    if not all(checks.values()):
+        raise SystemExit("Sharded run failed its checks")
+    return {'config': vars(args), 'shards': shards, 'checks': checks}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline load test for Froggy")
+    parser.add_argument('--guilds', type=int, default=20)
+    parser.add_argument('--channels', type=int, default=5, help="Channels per guild")
+    parser.add_argument('--users', type=int, default=500)
+    parser.add_argument('--rate', type=float, default=100, help="Incoming events per second")
+    parser.add_argument('--mention-ratio', type=float, default=0.1, help="Share of messages that mention Froggy")
+    parser.add_argument('--command-ratio', type=float, default=0.02, help="Share of events that are slash commands")
+    parser.add_argument('--duration', type=float, default=20, help="Seconds of traffic")
+    parser.add_argument('--drain', type=float, default=30, help="Seconds to wait for replies afterwards")
+    parser.add_argument('--latency', type=float, default=1.0, help="Mean stub latency of the fast model in seconds")
+    parser.add_argument('--strong-latency', type=float, default=2.5, help="Mean stub latency of the strong model")
+    parser.add_argument('--latency-jitter', type=float, default=0.3)
+    parser.add_argument('--send-latency', type=float, default=0.05, help="Fake Discord API latency in seconds")
+    parser.add_argument('--chunks', type=int, default=4, help="Chunks per streamed reply")
+    parser.add_argument('--stream', action=argparse.BooleanOptionalAction, default=True)
+    parser.add_argument('--idle-cooldown', type=float, default=5, help="Seconds before idle check-ins")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--shards', type=int, default=1,
+                        help="Run this many shard processes, each with its own share of the guilds")
+    parser.add_argument('--json', help="Also write the results to this file")
+    # Set by --shards for each shard process
+    parser.add_argument('--shard-id', type=int, help=argparse.SUPPRESS)
+    parser.add_argument('--workdir', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.shards > 1 and args.shard_id is None:
+        results = run_shards(args)
+    else:
+        results = asyncio.run(run(args))
+        print()
+        for key, value in results.items():
+            if key not in ('config', 'sharding'):
+                print(f"{key:>28}: {value}")
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
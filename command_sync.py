@@ -0,0 +1,108 @@
+import asyncio
+import hashlib
+import json
+import os
+import time
+
+DEFAULT_STATE_PATH = '.froggy_command_sync.json'
+DEFAULT_CONCURRENCY = 4  # Guild syncs allowed at once; discord.py waits out any 429s
+
+
+def _command_payload(tree, command):
+    # discord.py 2.4 passes the tree to to_dict(); 2.3 takes no arguments
+    try:
+        return command.to_dict(tree)
+    except TypeError:
+        return command.to_dict()
+
+
+def tree_hash(tree, guild=None):
+    payload = [_command_payload(tree, cmd) for cmd in tree.get_commands(guild=guild)]
+    payload.sort(key=lambda cmd: (cmd.get('type', 1), cmd['name']))
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+
+class CommandSyncer:
+    # Only syncs a command scope (global or one guild) when the local command
+    # tree differs from what was last pushed there. Hashes of what was pushed
+    # are kept on disk so restarts and reconnects cost no API calls.
+    def __init__(self, tree, path=DEFAULT_STATE_PATH, concurrency=DEFAULT_CONCURRENCY):
+        self.tree = tree
+        self.path = path
+        self.concurrency = concurrency
+        self.api_calls = 0
+        self._state = None  # Read from disk on the first sync
+
+    @property
+    def state(self):
+        if self._state is None:
+            self._state = self._load()
+        return self._state
+
+    def _load(self):
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save(self, updates):
+        # Merge with what's on disk so shard processes don't undo each other
+        state = self._load()
+        state.update(updates)
+        self._state = state
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+        os.replace(tmp, self.path)
+
+    def _scope(self, application_id, guild_id=None):
+        return f"{application_id}:{guild_id or 'global'}"
+
+    async def sync_global(self, application_id):
+        started = time.perf_counter()
+        scope = self._scope(application_id)
+        digest = tree_hash(self.tree)
+        if self.state.get(scope) == digest:
+            print(f"Global commands unchanged, skipped sync ({time.perf_counter() - started:.2f}s)")
+            return None
+        synced = await self.tree.sync()
+        self.api_calls += 1
+        self._save({scope: digest})
+        print(f"Synced {len(synced)} commands globally in {time.perf_counter() - started:.2f}s")
+        return synced
+
+    async def sync_guilds(self, application_id, guilds):
+        started = time.perf_counter()
+        calls_before = self.api_calls
+        pending = []
+        for guild in guilds:
+            scope = self._scope(application_id, guild.id)
+            digest = tree_hash(self.tree, guild=guild)
+            if self.state.get(scope) != digest:
+                pending.append((guild, scope, digest))
+
+        updates = {}
+        failed = []
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def sync_one(guild, scope, digest):
+            async with semaphore:
+                try:
+                    await self.tree.sync(guild=guild)
+                    updates[scope] = digest
+                except Exception as e:
+                    failed.append(guild)
+                    print(f"- Failed to sync commands for {guild.name}: {str(e)}")
+                finally:
+                    self.api_calls += 1
+
+        await asyncio.gather(*(sync_one(*item) for item in pending))
+        if updates:
+            self._save(updates)
+        print(
+            f"Guild command sync: {len(updates)} synced, {len(failed)} failed, "
+            f"{len(guilds) - len(pending)} unchanged, {self.api_calls - calls_before} API calls, "
+            f"{time.perf_counter() - started:.2f}s"
+        )
+        return updates
@@ -0,0 +1,240 @@
+import asyncio
+import json
+import sqlite3
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+
+# Defaults for conversation memory
+DEFAULT_MAX_MESSAGES = 5  # Messages kept per (channel, user) conversation
+DEFAULT_MAX_CONVERSATIONS = 50000  # Conversations held in RAM before LRU eviction
+DEFAULT_TTL = 7 * 24 * 3600  # Conversations untouched this long are forgotten
+
+
+class MemoryBackend:
+    # Where conversations live when they're not in RAM. Messages are lists of
+    # {'time', 'content', 'is_froggy'} dicts, oldest first.
+    def load(self, key):
+        raise NotImplementedError
+
+    def save_many(self, items):
+        raise NotImplementedError
+
+    def delete_older_than(self, cutoff):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class InMemoryBackend(MemoryBackend):
+    # Keeps nothing past the process; evicted conversations are simply gone
+    def load(self, key):
+        return None
+
+    def save_many(self, items):
+        pass
+
+    def delete_older_than(self, cutoff):
+        pass
+
+
+class SQLiteBackend(MemoryBackend):
+    def __init__(self, path):
+        # Shard processes share the file, so wait on each other's write locks
+        # ConversationMemory uses the connection from its own worker thread
+        self.conn = sqlite3.connect(path, timeout=10, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS conversations ("
+            "channel_id INTEGER NOT NULL, user_id INTEGER NOT NULL, "
+            "updated REAL NOT NULL, messages TEXT NOT NULL, "
+            "PRIMARY KEY (channel_id, user_id))"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS conversations_updated ON conversations (updated)")
+        self.conn.commit()
+
+    def load(self, key):
+        row = self.conn.execute(
+            "SELECT messages FROM conversations WHERE channel_id = ? AND user_id = ?", key
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def save_many(self, items):
+        rows = [
+            (channel_id, user_id, messages[-1]['time'] if messages else 0, json.dumps(list(messages)))
+            for (channel_id, user_id), messages in items
+        ]
+        with self.conn:
+            self.conn.executemany("INSERT OR REPLACE INTO conversations VALUES (?, ?, ?, ?)", rows)
+
+    def delete_older_than(self, cutoff):
+        with self.conn:
+            self.conn.execute("DELETE FROM conversations WHERE updated < ?", (cutoff,))
+
+    def close(self):
+        self.conn.close()
+
+
+class ConversationMemory:
+    # Recent messages per (channel_id, user_id), held in fixed-size deques.
+    # RAM holds at most max_conversations entries in LRU order; anything evicted
+    # or changed is written back to the backend in batches by flush().
+    # Appending to a conversation that isn't in RAM doesn't read the backend;
+    # what's stored is merged in by load(), or by the next flush().
+    # get() and append() never touch the backend, so they're safe on the event
+    # loop. load(), flush(), prune() and close() run backend I/O on one worker
+    # thread, one at a time.
+    def __init__(self, backend=None, max_messages=DEFAULT_MAX_MESSAGES,
+                 max_conversations=DEFAULT_MAX_CONVERSATIONS, ttl=DEFAULT_TTL):
+        self.backend = backend or InMemoryBackend()
+        self.max_messages = max_messages
+        self.max_conversations = max_conversations
+        self.ttl = ttl
+        self._conversations = OrderedDict()
+        self._dirty = set()
+        self._unmerged = set()  # Started in RAM without loading what's stored
+        self._evicted = {}  # Evicted but not yet written: key -> history
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='froggy-memory')
+        self._io_lock = None
+
+    def __len__(self):
+        return len(self._conversations)
+
+    async def _io(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    def _lock(self):
+        # Created on first use so it binds to the running loop
+        if self._io_lock is None:
+            self._io_lock = asyncio.Lock()
+        return self._io_lock
+
+    def get(self, channel_id, user_id):
+        # What's in RAM, without reading the backend; await load() first to
+        # include stored history. Never creates an entry, so reads can't grow memory
+        key = (channel_id, user_id)
+        history = self._cached(key)
+        if history is None:
+            return ()
+        if history and time.time() - history[-1]['time'] > self.ttl:
+            del self._conversations[key]
+            self._dirty.discard(key)
+            self._unmerged.discard(key)
+            return ()
+        return history
+
+    def append(self, channel_id, user_id, content, is_froggy=False):
+        key = (channel_id, user_id)
+        history = self._cached(key)
+        if history is None:
+            history = self._conversations[key] = deque(maxlen=self.max_messages)
+            self._unmerged.add(key)
+            self._evict()
+        history.append({
+            'time': time.time(),
+            'content': content,
+            'is_froggy': is_froggy
+        })
+        self._dirty.add(key)
+
+    def _cached(self, key):
+        history = self._conversations.get(key)
+        if history is not None:
+            self._conversations.move_to_end(key)
+            return history
+        history = self._evicted.pop(key, None)
+        if history is not None:
+            # Evicted but not written yet; bring it back instead of losing it
+            self._conversations[key] = history
+            self._dirty.add(key)
+            self._evict()
+        return history
+
+    async def load(self, channel_id, user_id):
+        # Makes sure RAM holds the whole conversation, reading the backend if needed
+        key = (channel_id, user_id)
+        history = self._cached(key)
+        if history is not None and key not in self._unmerged:
+            return
+        async with self._lock():
+            history = self._cached(key)
+            if history is not None and key not in self._unmerged:
+                return
+            stored = await self._io(self.backend.load, key)
+            history = self._cached(key)
+            if history is None:
+                if stored:
+                    self._conversations[key] = deque(stored, maxlen=self.max_messages)
+                    self._evict()
+            elif key in self._unmerged:
+                self._conversations[key] = self._merged(key, stored, history)
+
+    def _merged(self, key, stored, history):
+        # Stored messages are older than anything appended since
+        self._unmerged.discard(key)
+        if not stored:
+            return history
+        merged = deque(stored, maxlen=self.max_messages)
+        merged.extend(history)
+        return merged
+
+    def _evict(self):
+        # Dirty conversations wait in _evicted for the next flush()
+        while len(self._conversations) > self.max_conversations:
+            key, history = self._conversations.popitem(last=False)
+            if key in self._dirty:
+                self._dirty.discard(key)
+                self._evicted[key] = history
+            else:
+                self._unmerged.discard(key)
+
+    async def flush(self):
+        # Write changed conversations to the backend in one batch
+        async with self._lock():
+            sources = {key: self._conversations[key] for key in self._dirty if key in self._conversations}
+            sources.update(self._evicted)
+            if not sources:
+                return 0
+            items = {key: list(history) for key, history in sources.items()}
+            unmerged = [key for key in items if key in self._unmerged]
+            self._dirty.clear()
+            self._evicted.clear()
+            stored = await self._io(self._save, items, unmerged)
+            for key, messages in stored.items():
+                history = self._conversations.get(key)
+                if history is sources[key] and key in self._unmerged:
+                    # The backend now has these messages too, so RAM takes the older ones
+                    self._conversations[key] = self._merged(key, messages, history)
+                elif history is None and key not in self._evicted:
+                    self._unmerged.discard(key)
+                # Otherwise RAM holds only messages newer than what was just
+                # written, and stays unmerged until the next load() or flush()
+            return len(items)
+
+    def _save(self, items, unmerged):
+        # Runs on the worker thread. Returns what was stored before for the
+        # unmerged conversations, so RAM can catch up
+        stored = {key: self.backend.load(key) or [] for key in unmerged}
+        for key, messages in stored.items():
+            items[key] = (messages + items[key])[-self.max_messages:]
+        self.backend.save_many(list(items.items()))
+        return stored
+
+    async def prune(self):
+        # Drop conversations that have gone quiet for longer than the TTL
+        cutoff = time.time() - self.ttl
+        expired = [key for key, history in self._conversations.items() if history and history[-1]['time'] < cutoff]
+        for key in expired:
+            del self._conversations[key]
+            self._dirty.discard(key)
+            self._unmerged.discard(key)
+        async with self._lock():
+            await self._io(self.backend.delete_older_than, cutoff)
+        return len(expired)
+
+    async def close(self):
+        await self.flush()
+        await self._io(self.backend.close)
+        self._executor.shutdown(wait=False)
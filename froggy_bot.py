@@ -1,78 +1,178 @@
+import time
+IMPORT_STARTED = time.perf_counter()
 import os
 import discord
 from discord.ext import commands
-import google.generativeai as genai
 from dotenv import load_dotenv
 import random
 from datetime import datetime
-import pytz
-from collections import defaultdict
-import time
+import functools
 import asyncio
 from discord import app_commands
 import logging
 import json
+from gemini_client import GeminiClient, supports_system_instruction
+from model_router import ModelRouter, FAST, Throttled
+from rate_limiter import RateLimiter, TokenBuckets
+from streaming_reply import StreamingReply, DISCORD_MESSAGE_LIMIT
+from mention_coalescer import MentionCoalescer
+from conversation_memory import ConversationMemory, SQLiteBackend
+from prompt_builder import PromptBuilder
+from response_cache import ResponseCache
+from moderation import ModerationEngine, WordFilter
+from idle_scheduler import IdleScheduler
+from command_sync import CommandSyncer
+from send_queue import OutboundDispatcher, MODERATION, REPLY, FUN
+from metrics import Registry, StartupProfile, serve_metrics, watch_loop_lag
+from message_pipeline import MessagePipeline, MessageInfo, PriorityWorkers
+from lifecycle import Lifecycle
+import state_snapshot
+from guild_config import GuildConfigStore, parse_bool, int_between
+from typing import Optional
 
-# Set up logging
-logging.basicConfig(level=logging.DEBUG)
-logger = logging.getLogger('discord')
-logger.setLevel(logging.DEBUG)
+# Importing this module only defines things and reads settings from the
+# environment: it touches no files and starts no threads. Logging, the
+# environment check, the word list file and the on-disk stores are set up by
+# create_app(); the Gemini SDK, its worker threads, timezone data and the
+# command sync state load on first use. Phases are timed for the startup report
+startup = StartupProfile(started=IMPORT_STARTED)
+startup.checkpoint('imports')
+IMPORT_BUDGET = 0.5  # Seconds importing may take before startup warns about it
 
-# Load environment variables
-load_dotenv()
+# `python froggy_bot.py` reads .env before any setting below. Importing the
+# module leaves the environment alone, so tests and benchmarks set what they
+# need (or call load_dotenv() themselves) before importing. Settings are read
+# at import because some decide how the bot is built (sharding)
+if __name__ == "__main__":
+    load_dotenv()
+
+# DEBUG dumps every gateway payload, so only use it when needed
+LOG_LEVEL = os.getenv('FROGGY_LOG_LEVEL', 'INFO').upper()
 
 # Get tokens from environment variables
 DISCORD_TOKEN = os.getenv('DISCORD_TOKEN')
 GEMINI_API_KEY = os.getenv('GEMINI_API_KEY')
 
-if not DISCORD_TOKEN or not GEMINI_API_KEY:
-    print("Error: Missing required environment variables!")
-    print("Make sure you have a .env file with:")
-    print("DISCORD_TOKEN=your_token_here")
-    print("GEMINI_API_KEY=your_key_here")
-    raise ValueError("Missing required environment variables. Please check your .env file.")
-
-# Debug: Print environment variables
-print("Discord Token:", DISCORD_TOKEN)
-print("Gemini API Key:", GEMINI_API_KEY)
-
 # Configure Discord bot
 intents = discord.Intents.default()
 intents.message_content = True
 intents.reactions = True
 intents.members = True
 
+# Sharding. FROGGY_SHARDED=1 runs every shard in this process; the launcher
+# (froggy_launcher.py) sets FROGGY_SHARD_COUNT and FROGGY_SHARD_IDS to give
+# each process its own range of shards
+SHARD_COUNT = int(os.getenv('FROGGY_SHARD_COUNT', '0')) or None
+SHARD_IDS = [int(i) for i in os.getenv('FROGGY_SHARD_IDS', '').split(',') if i.strip()] or None
+SHARDED = os.getenv('FROGGY_SHARDED') == '1' or SHARD_COUNT is not None
+# Only one process needs to sync the global command list
+IS_PRIMARY_SHARD = SHARD_IDS is None or 0 in SHARD_IDS
+
+# Hashes of the last synced command tree, so unchanged commands aren't re-synced
+COMMAND_SYNC_STATE_PATH = os.getenv('FROGGY_COMMAND_SYNC_STATE', '.froggy_command_sync.json')
+
+BotBase = commands.AutoShardedBot if SHARDED else commands.Bot
+COMMAND_PREFIX = '!'
+
 # Update bot configuration
-class FroggyBot(commands.Bot):
+class FroggyBot(BotBase):
     def __init__(self):
-        super().__init__(command_prefix='!', intents=intents)
+        if SHARDED:
+            super().__init__(command_prefix=COMMAND_PREFIX, intents=intents, shard_count=SHARD_COUNT, shard_ids=SHARD_IDS)
+        else:
+            super().__init__(command_prefix=COMMAND_PREFIX, intents=intents)
+        self.command_syncer = CommandSyncer(self.tree, path=COMMAND_SYNC_STATE_PATH)
+        self.ready_once = False
         
     async def setup_hook(self):
+        startup.checkpoint('login')
+        lifecycle.install_signal_handlers(lambda name: asyncio.ensure_future(shutdown_bot(name)))
+        lifecycle.spawn('maintenance', run_maintenance)
+        lifecycle.spawn('loop_lag', lambda: watch_loop_lag(LOOP_LAG_SECONDS))
+        if METRICS_PORT:
+            try:
+                server = await serve_metrics(metrics, port=METRICS_PORT)
+                lifecycle.on_shutdown('metrics endpoint', server.close)
+                print(f"Metrics available at http://127.0.0.1:{METRICS_PORT}/metrics")
+            except OSError as e:
+                print(f"Couldn't start metrics endpoint: {str(e)}")
+        if not IS_PRIMARY_SHARD:
+            return
         print("\n=== Starting Command Sync ===")
         try:
-            print("Attempting to sync commands...")
-            # Sync commands globally
-            commands = await self.tree.sync()
-            print(f"Successfully synced {len(commands)} commands globally!")
-            for cmd in commands:
+            # Sync commands globally, unless they haven't changed since last time
+            commands = await self.command_syncer.sync_global(self.application_id)
+            for cmd in commands or []:
                 print(f"- Synced: /{cmd.name}")
         except Exception as e:
             print(f"Error syncing commands: {str(e)}")
+        startup.checkpoint('command_sync')
         print("=== Command Sync Complete ===\n")
 
 bot = FroggyBot()
 
-# Configure Gemini AI
-genai.configure(api_key=GEMINI_API_KEY)
+# Stream replies into Discord as Gemini generates them
+STREAM_REPLIES = True
+STREAM_EDIT_INTERVAL = 1.2  # Seconds between message edits while streaming
+
+# Metrics, served Prometheus-style on localhost. Each shard process gets its
+# own port (base port + first shard ID); set FROGGY_METRICS_PORT=0 to turn off
+METRICS_PORT = int(os.getenv('FROGGY_METRICS_PORT', '9108'))
+if METRICS_PORT and SHARD_IDS:
+    METRICS_PORT += SHARD_IDS[0]
+metrics = Registry()
+GEMINI_SECONDS = metrics.histogram('froggy_gemini_seconds', 'Time for a Gemini call to finish')
+FIRST_TOKEN_SECONDS = metrics.histogram('froggy_first_token_seconds', 'Time until the first part of a reply is visible')
+PROMPT_BUILD_SECONDS = metrics.histogram('froggy_prompt_build_seconds', 'Time to assemble a prompt')
+MODERATION_SECONDS = metrics.histogram('froggy_moderation_seconds', 'Time to check a message for bad or mean words')
+DISCORD_SEND_SECONDS = metrics.histogram('froggy_discord_send_seconds', 'Time for a Discord send, reply or reaction')
+LOOP_LAG_SECONDS = metrics.histogram('froggy_event_loop_lag_seconds', 'How late the event loop runs scheduled work')
+# Pipeline stages mostly take microseconds, so they get finer buckets
+PIPELINE_BUCKETS = (0.000001, 0.000005, 0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5)
+PIPELINE_SECONDS = metrics.histogram('froggy_pipeline_stage_seconds', 'Time spent in each on_message stage', buckets=PIPELINE_BUCKETS)
+ERRORS = metrics.counter('froggy_errors_total', 'Errors by where they happened')
+THROTTLED = metrics.counter('froggy_throttled_total', 'Mentions answered with a canned line because a rate limit was hit')
+FALLBACKS = metrics.counter('froggy_fallback_replies_total', 'Canned replies sent instead of a generated one')
+MODEL_SECONDS = metrics.histogram('froggy_model_seconds', 'Time for a routed Gemini call, by requested tier, reason, serving model and outcome')
+metrics.gauge('froggy_gemini_in_flight', 'Gemini calls in progress', lambda: gemini.in_flight)
+metrics.gauge('froggy_fast_circuit_open', 'Whether the fast model is being skipped after failures', lambda: int(gemini.breaker_state('fast') != 'closed'))
+metrics.gauge('froggy_strong_circuit_open', 'Whether the strong model is being skipped after failures', lambda: int(gemini.breaker_state('strong') != 'closed'))
+metrics.counter_func('froggy_response_cache_hits_total', 'Mentions answered from the response cache', lambda: response_cache.hits)
+metrics.counter_func('froggy_response_cache_misses_total', 'Mentions that missed the response cache', lambda: response_cache.misses)
+metrics.counter_func('froggy_response_cache_saved_seconds_total', 'Estimated generation time saved by the cache', lambda: response_cache.saved_seconds)
+metrics.counter_func('froggy_mentions_dropped_total', 'Mentions dropped by backpressure', lambda: mention_queue.dropped)
+metrics.gauge('froggy_outbound_pending', 'Discord sends waiting in the queue', lambda: outbound.pending())
+metrics.counter_func('froggy_outbound_failed_total', 'Discord sends that failed', lambda: outbound.failed)
+metrics.gauge('froggy_conversations_in_memory', 'Conversations held in RAM', lambda: len(conversation_history))
+metrics.gauge('froggy_rate_limit_buckets', 'Rate limit buckets held in memory', lambda: sum(rate_limiter.stats()['buckets'].values()))
+metrics.counter_func('froggy_messages_skipped_total', 'Messages the pre-filter ignored (bots, channels Froggy can\'t talk in)', lambda: pipeline.skipped)
+metrics.gauge('froggy_pipeline_deferred_pending', 'Deferred message stages waiting for a worker', lambda: pipeline.workers.pending())
+metrics.gauge('froggy_idle_channels', 'Channels waiting for an idle check-in', lambda: len(idle_channels))
+
+def observe_send(kind, seconds, ok):
+    DISCORD_SEND_SECONDS.observe(seconds, kind=kind)
+    if not ok:
+        ERRORS.inc(where='discord_send')
 
-# Use the correct model name
-model = genai.GenerativeModel('gemini-1.5-pro')
+# Everything Froggy posts is queued per channel and paced to Discord's rate limits
+outbound = OutboundDispatcher(observer=observe_send)
+
+# Mention bursts in the same channel
+MENTION_COALESCE_WINDOW = 0.5  # Seconds to wait for more mentions before replying
+MENTION_MAX_BATCH = 5  # Most mentions answered in one merged reply
+MENTION_MAX_PENDING = 20  # Mentions queued per channel before new ones are dropped
+MENTION_BACKPRESSURE = "merge"  # "merge", "defer" or "drop"
 
 # Conversation memory
-MAX_MEMORY_MESSAGES = 5  # Remember last 5 messages
-conversation_history = defaultdict(list)
-last_interaction = defaultdict(float)
-INTERACTION_COOLDOWN = 300  # 5 minutes between random interactions
+MAX_MEMORY_MESSAGES = 20  # Messages stored per conversation; prompts are trimmed by token budget
+MAX_CONVERSATIONS = 50000  # Conversations kept in RAM; older ones spill to disk
+MEMORY_TTL = 7 * 24 * 3600  # Forget conversations that have been quiet for a week
+MEMORY_FLUSH_INTERVAL = 30  # Seconds between writes of changed conversations to disk
+MEMORY_DB_PATH = os.getenv('FROGGY_MEMORY_DB', 'froggy_memory.db')
+conversation_history = None  # Opened by create_app()
+INTERACTION_COOLDOWN = 300  # 5 minutes of quiet before Froggy checks back in
+INTERACTION_JITTER = 60  # Up to a minute of random delay on top of the cooldown
+INTERACTION_RATE = 10  # Most check-ins per minute across all channels
 
 # Froggy's personality traits and responses
 FROGGY_TRAITS = {
@@ -85,9 +185,30 @@ FROGGY_TRAITS = {
     ],
     'reactions': [
         "🐸", "🧩", "💭"
+    ],
+    'busy': [
+        "Whoa, slow down! Let me catch my breath for a sec 🐸",
+        "So many ribbits at once! Give me a moment to hop back to you!",
+        "I'm a little swamped right now, try me again in a bit!",
+        "Hold that thought! I'll be ready to chat again soon 💭"
     ]
 }
 
+# Rate limits on generated replies, as (replies, per seconds)
+USER_REPLY_LIMIT = (6, 60)
+CHANNEL_REPLY_LIMIT = (20, 60)
+GUILD_REPLY_LIMIT = (60, 60)
+GLOBAL_REPLY_LIMIT = (300, 60)  # Every Gemini call across the bot, kept under the API quota
+QUOTA_BACKOFF = 30  # Seconds to stop calling Gemini after it reports the quota is used up
+THROTTLE_NOTICE_PER = 60  # A throttled user hears about it at most once this often
+rate_limiter = RateLimiter(
+    user=USER_REPLY_LIMIT,
+    channel=CHANNEL_REPLY_LIMIT,
+    guild=GUILD_REPLY_LIMIT,
+    global_limit=GLOBAL_REPLY_LIMIT
+)
+throttle_notices = TokenBuckets(1, THROTTLE_NOTICE_PER)
+
 # Froggy's personality prompt
 FROGGY_PROMPT = """You are Froggy, a friendly and outgoing frog who loves chatting with friends. You're great at remembering details about conversations and following up on them.
 
@@ -107,159 +228,526 @@ Example responses:
 "That reminds me of what we were talking about last time - about your favorite games!"
 """
 
-# Simple word filter
+# Gemini AI. Casual chat goes to the fast model; long or tricky turns get the strong one
+FAST_MODEL = os.getenv('FROGGY_FAST_MODEL', 'gemini-1.5-flash')
+STRONG_MODEL = os.getenv('FROGGY_STRONG_MODEL', 'gemini-1.5-pro')
+
+# Newer SDKs take the persona as a system instruction, so it doesn't have to
+# be sent with every prompt
+PERSONA_IN_SYSTEM = supports_system_instruction()
+
+def load_model(name):
+    # Called the first time a model is needed (or by warm() once connected),
+    # so importing and starting Froggy doesn't wait for the Gemini SDK
+    with startup.phase(f'gemini:{name}'):
+        import google.generativeai as genai
+        genai.configure(api_key=GEMINI_API_KEY)
+        if PERSONA_IN_SYSTEM:
+            return genai.GenerativeModel(name, system_instruction=FROGGY_PROMPT)
+        return genai.GenerativeModel(name)
+
+# All Gemini calls go through this so slow replies don't block the gateway
+GEMINI_MAX_CONCURRENCY = 8  # Max generations in flight at once, per model
+GEMINI_TIMEOUT = 30  # Seconds before a generation is abandoned
+MODEL_HEDGE_AFTER = 4.0  # Seconds a strong reply gets before the fast model races it
+MODEL_LONG_WORDS = 30  # Messages at least this long go to the strong model
+
+def observe_route(tier, reason, served_by, seconds, outcome):
+    MODEL_SECONDS.observe(seconds, tier=tier, reason=reason, model=served_by or 'none', outcome=outcome)
+
+def note_gemini_error(error):
+    # Any call that hits the quota, reply, summary or hedge, pauses them all
+    from google.api_core.exceptions import ResourceExhausted
+    if isinstance(error, ResourceExhausted):
+        rate_limiter.backoff(QUOTA_BACKOFF)
+
+gemini = ModelRouter(
+    GeminiClient(
+        load_model=functools.partial(load_model, FAST_MODEL),
+        max_concurrency=GEMINI_MAX_CONCURRENCY,
+        timeout=GEMINI_TIMEOUT
+    ),
+    GeminiClient(
+        load_model=functools.partial(load_model, STRONG_MODEL),
+        max_concurrency=GEMINI_MAX_CONCURRENCY,
+        timeout=GEMINI_TIMEOUT
+    ),
+    hedge_after=MODEL_HEDGE_AFTER,
+    long_words=MODEL_LONG_WORDS,
+    observer=observe_route,
+    # Every model call, hedges and fallbacks included, is charged to the global limit
+    admit=rate_limiter.take_global,
+    on_error=note_gemini_error
+)
+
+# Prompt assembly
+CONTEXT_TOKEN_BUDGET = 800  # Estimated tokens of conversation history per prompt
+
+async def summarize_turns(previous_summary, text):
+    prompt = (
+        "Summarize the important details from this chat in one or two short sentences, "
+        "so they can be remembered later.\n\n"
+    )
+    if previous_summary:
+        prompt += f"What was already remembered: {previous_summary}\n\n"
+    with GEMINI_SECONDS.time(mode='summary'):
+        response = await gemini.generate(prompt + text, tier=FAST, reason='summary')
+    return response.text if response else None
+
+prompt_builder = PromptBuilder(
+    FROGGY_PROMPT,
+    token_budget=CONTEXT_TOKEN_BUDGET,
+    summarize=summarize_turns,
+    persona_in_system=PERSONA_IN_SYSTEM
+)
+
+# Replies to repeated mentions are reused instead of regenerated
+RESPONSE_CACHE_ENABLED = True
+RESPONSE_CACHE_SIZE = 5000  # Exact-match replies kept
+RESPONSE_CACHE_TTL = 3600  # Seconds a cached reply stays usable
+# Reworded matches need a sentence embedding function, embed(text) -> vector
+# (and numpy). Off by default: exact matches after normalizing are safe to share
+RESPONSE_CACHE_EMBED = None
+RESPONSE_CACHE_SIMILARITY = 0.95  # How close a reworded message must be
+response_cache = ResponseCache(
+    max_entries=RESPONSE_CACHE_SIZE,
+    ttl=RESPONSE_CACHE_TTL,
+    embed=RESPONSE_CACHE_EMBED,
+    threshold=RESPONSE_CACHE_SIMILARITY
+)
+
+# Simple word filter. Extra words can go in FROGGY_BAD_WORDS_FILE (one per
+# line), which is re-read whenever it changes
 BAD_WORDS = [
     "badword1", "badword2"  # Add actual bad words here
 ]
+BAD_WORDS_FILE = os.getenv('FROGGY_BAD_WORDS_FILE')
+moderation = ModerationEngine(BAD_WORDS, path=BAD_WORDS_FILE)  # The file is read by create_app()
+
+# Words that mean someone is being unkind to Froggy
+MEAN_WORDS = WordFilter(['stupid', 'dumb', 'hate', 'bad', 'ugly', 'shut up', 'annoying'])
+
+def contains_bad_words(text, guild_id=None):
+    return moderation.contains(text, guild_id)
+
+# Per-server settings, kept on disk and cached in memory. Servers that haven't
+# changed anything use these defaults
+CONFIG_DB_PATH = os.getenv('FROGGY_CONFIG_DB', 'froggy_config.db')
+GUILD_DEFAULTS = {
+    'staff_channel_id': None,  # Set by /setstaff
+    'bad_words': [],  # Extra filtered words on top of BAD_WORDS
+    'interaction_cooldown': INTERACTION_COOLDOWN,
+    'memory_messages': MAX_MEMORY_MESSAGES,
+    'response_cache': RESPONSE_CACHE_ENABLED
+}
+# Settings admins can change with /config, with how to read the typed value
+CONFIG_SETTINGS = {
+    'interaction_cooldown': ("Seconds of quiet before Froggy checks back in", int_between(60, 86400)),
+    'memory_messages': ("How many recent messages Froggy remembers", int_between(1, MAX_MEMORY_MESSAGES)),
+    'response_cache': ("Reuse replies to repeated messages (on/off)", parse_bool)
+}
+guild_config = None  # Opened by create_app()
+
+def apply_guild_settings(guild_id, settings):
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        # Loading stored settings in create_app(); nothing to stall yet
+        moderation.set_guild_words(guild_id, settings['bad_words'])
+        return
+    # From /badwords or /config: build the guild's filter off the event loop
+    asyncio.ensure_future(moderation.update_guild_words(guild_id, settings['bad_words']))
 
-def contains_bad_words(text):
-    text_lower = text.lower()
-    return any(word in text_lower for word in BAD_WORDS)
+def settings_for(guild):
+    return guild_config.get(guild.id if guild else None)
 
-# Staff channel for reports
-STAFF_CHANNEL_ID = None  # Will be set by /setstaff command
+@functools.lru_cache(maxsize=None)
+def get_timezone(name):
+    # pytz is only imported once a time is actually needed
+    import pytz
+    return pytz.timezone(name)
 
 def get_current_time():
-    central = pytz.timezone('America/Chicago')
-    current_time = datetime.now(central)
+    current_time = datetime.now(get_timezone('America/Chicago'))
     return current_time.strftime("%I:%M %p Central Time")
 
 def update_conversation_history(channel_id, user_id, message_content, is_froggy=False):
-    key = f"{channel_id}_{user_id}"
-    conversation_history[key].append({
-        'time': time.time(),
-        'content': message_content,
-        'is_froggy': is_froggy
-    })
-    # Keep only recent messages
-    conversation_history[key] = conversation_history[key][-MAX_MEMORY_MESSAGES:]
-
-def get_conversation_context(channel_id, user_id):
-    key = f"{channel_id}_{user_id}"
-    history = conversation_history[key]
-    
-    if not history:
-        return "This is the start of the conversation."
-    
-    context = "Recent conversation history:\n"
-    for msg in history:
-        speaker = "Froggy" if msg['is_froggy'] else "Friend"
-        context += f"{speaker}: {msg['content']}\n"
-    return context
+    conversation_history.append(channel_id, user_id, message_content, is_froggy)
+
+def get_conversation_context(channel_id, user_id, max_messages=None):
+    history = conversation_history.get(channel_id, user_id)
+    return prompt_builder.context((channel_id, user_id), history, max_messages)
 
 @bot.event
 async def on_ready():
     print(f"\n=== Bot Connected ===")
     print(f"Logged in as: {bot.user.name} (ID: {bot.user.id})")
+    if SHARDED:
+        print(f"Shards: {sorted(bot.shards)} of {bot.shard_count}")
     print(f"Discord API Version: {discord.__version__}")
     
+    # on_ready fires again after every reconnect; the rest only needs doing once
+    if bot.ready_once:
+        print("=== Reconnected ===")
+        return
+    bot.ready_once = True
+    startup.checkpoint('gateway')
+    lifecycle.spawn('warm_up', warm_up, restart=False)
+    
     print("\n=== Server Information ===")
-    for guild in bot.guilds:
-        print(f"\nServer: {guild.name} (ID: {guild.id})")
-        try:
-            # Try to sync commands for this specific guild
-            await bot.tree.sync(guild=guild)
-            print(f"- Synced commands for {guild.name}")
-        except Exception as e:
-            print(f"- Failed to sync commands for {guild.name}: {str(e)}")
+    print(f"Connected to {len(bot.guilds)} server(s)")
+    # Sync guild commands concurrently, skipping guilds that are already up to date
+    await bot.command_syncer.sync_guilds(bot.application_id, bot.guilds)
+    startup.checkpoint('guild_command_sync')
     
     print("\n=== Available Commands ===")
     for cmd in bot.tree.get_commands():
         print(f"/{cmd.name} - {cmd.description}")
     
     await bot.change_presence(activity=discord.Game(name="chatting with friends 🐸"))
-    print("\n=== Bot is Ready! ===")
-    bot.loop.create_task(random_interactions())
+    print(f"\n=== Bot is Ready! ({startup.elapsed():.1f}s after start, {bot.command_syncer.api_calls} command sync API calls) ===")
+    print(startup.report())
+    lifecycle.spawn('idle_followups', random_interactions)
 
-async def random_interactions():
+async def warm_up():
+    # Load the Gemini SDK, build the models and set up the response cache in
+    # the background once connected, so the first mention doesn't pay for it
+    try:
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(gemini.warm(), loop.run_in_executor(None, response_cache.warm))
+        print(f"Gemini models ready ({startup.seconds('gemini:' + FAST_MODEL) + startup.seconds('gemini:' + STRONG_MODEL):.2f}s)")
+    except Exception as e:
+        print(f"Error loading Gemini models: {str(e)}")
+
+async def run_maintenance():
+    # Batch conversation writes to disk, expire stale ones and report cache use
+    last_prune = time.time()
     while True:
-        await asyncio.sleep(60)  # Check every minute
-        current_time = time.time()
-        
-        for channel in bot.get_all_channels():
-            if isinstance(channel, discord.TextChannel):
-                channel_id = channel.id
-                last_time = last_interaction[channel_id]
-                
-                # If enough time has passed since last interaction
-                if current_time - last_time > INTERACTION_COOLDOWN:
-                    # Get conversation history
-                    history = conversation_history.get(f"{channel_id}_", [])
-                    if history:
-                        # Generate a follow-up question or comment based on history
-                        context = f"{FROGGY_PROMPT}\n\nPrevious conversation:\n{get_conversation_context(channel_id, '')}\n\nGenerate a natural follow-up comment or question to restart the conversation:"
-                        try:
-                            response = model.generate_content(context)
-                            if response and response.text:
-                                await channel.send(response.text.strip().replace('"', ''))
-                                last_interaction[channel_id] = current_time
-                        except Exception as e:
-                            print(f"Error in random interaction: {str(e)}")
+        await asyncio.sleep(MEMORY_FLUSH_INTERVAL)
+        try:
+            await conversation_history.flush()
+            rate_limiter.sweep()
+            throttle_notices.sweep(time.monotonic())
+            sweep_reply_permissions()
+            if await moderation.reload_if_changed():
+                print(f"Reloaded bad word list from {BAD_WORDS_FILE}")
+            if time.time() - last_prune > 3600:
+                await conversation_history.prune()
+                print(f"Response cache: {response_cache.stats()}")
+                print(f"Model routing: {gemini.stats()}")
+                print(f"Rate limits: {rate_limiter.stats()}")
+                print(f"Message pipeline: {pipeline.stats()}")
+                last_prune = time.time()
+        except Exception as e:
+            print(f"Error saving conversation memory: {str(e)}")
 
-@bot.event
-async def on_message(message):
-    if message.author == bot.user:
+async def idle_followup(channel_id, user_id):
+    # Only channels Froggy already replied in get here, so anything found can take a message
+    channel = bot.get_channel(channel_id)
+    if channel is None:
         return
-
-    # Check for bad words
-    if await handle_bad_message(message):
+    # Get conversation history
+    await conversation_history.load(channel_id, user_id)
+    history = conversation_history.get(channel_id, user_id)
+    if not history or not rate_limiter.global_allowed():
         return
+    # Generate a follow-up question or comment based on history
+    memory_messages = settings_for(getattr(channel, 'guild', None))['memory_messages']
+    context = f"{prompt_builder.persona_prefix}Previous conversation:\n{get_conversation_context(channel_id, user_id, memory_messages)}\n\nGenerate a natural follow-up comment or question to restart the conversation:"
+    with GEMINI_SECONDS.time(mode='followup'):
+        response = await gemini.generate(context, tier=FAST, reason='followup')
+    if response and response.text:
+        followup = response.text.strip().replace('"', '')
+        outbound.send(channel, followup, priority=FUN)
+        update_conversation_history(channel_id, user_id, followup, is_froggy=True)
 
-    # Check if message is mean to Froggy
-    if bot.user.mentioned_in(message):
-        message_lower = message.content.lower()
-        mean_words = ['stupid', 'dumb', 'hate', 'bad', 'ugly', 'shut up', 'annoying']
-        
-        if any(word in message_lower for word in mean_words):
-            responses = [
-                "Hey, that's not very nice! What did I do to deserve that?",
-                "Those words hurt my feelings... Can we be friends instead?",
-                "I'm just trying to be friendly! Why are you being mean?",
-                "That makes me sad... I just want to spread happiness!",
-                "Even if you're upset, we can talk nicely to each other!"
-            ]
-            await message.reply(random.choice(responses))
-            return
+# Wakes only when a channel Froggy talked in has gone quiet
+idle_channels = IdleScheduler(
+    idle_followup,
+    cooldown=INTERACTION_COOLDOWN,
+    jitter=INTERACTION_JITTER,
+    rate=INTERACTION_RATE,
+    per=60,
+    # No new check-ins while shutting down; they're kept for the snapshot instead
+    paused=lambda: lifecycle.closing
+)
 
-    # Process commands first
-    await bot.process_commands(message)
+async def random_interactions():
+    await idle_channels.run()
 
-    # Update conversation history
-    if not message.author.bot:
-        update_conversation_history(message.channel.id, message.author.id, message.content)
+async def send_full_reply(message, context, tier, reason):
+    started = time.perf_counter()
+    with GEMINI_SECONDS.time(mode='generate'):
+        response = await gemini.generate(context, tier=tier, reason=reason)
+    FIRST_TOKEN_SECONDS.observe(time.perf_counter() - started)
+    if not (response and response.text):
+        return None
+    # Clean and send the response
+    clean_response = response.text.strip().replace('"', '')
+    if await outbound.reply(message, clean_response) is None:
+        raise RuntimeError("Couldn't post the reply to Discord")
+    return clean_response
 
-    # Respond to mentions
-    if bot.user.mentioned_in(message):
-        async with message.channel.typing():
-            try:
-                # Get conversation context
-                context = f"{FROGGY_PROMPT}\n\n{get_conversation_context(message.channel.id, message.author.id)}\n\nFriend: {message.content}\nFroggy:"
+async def send_streamed_reply(message, context, tier, reason):
+    reply = StreamingReply(
+        message,
+        edit_interval=STREAM_EDIT_INTERVAL,
+        reply=lambda content: outbound.reply(message, content),
+        send=lambda content: outbound.send(message.channel, content),
+        edit=lambda sent, content: outbound.edit(sent, content)
+    )
+    try:
+        async for chunk in gemini.stream(context, tier=tier, reason=reason):
+            await reply.feed(chunk)
+    except Exception as e:
+        # Keep whatever already made it to the channel
+        if not reply.messages:
+            raise
+        print(f"Gemini stream interrupted: {str(e)}")
+    clean_response = await reply.finish()
+    GEMINI_SECONDS.observe(reply.total_latency, mode='stream')
+    if reply.messages:
+        FIRST_TOKEN_SECONDS.observe(reply.first_token_latency)
+        print(f"Streamed reply in #{message.channel.id}: first token {reply.first_token_latency:.2f}s, "
+              f"total {reply.total_latency:.2f}s, {len(reply.messages)} message(s)")
+    return clean_response
+
+# on_message runs every message through a staged pipeline. A pre-filter
+# classifies it once and drops traffic Froggy has nothing to do with; the
+# remaining stages are cheap checks, and anything slow is handed off (replies
+# to the mention queue, moderation replies to the outbound queue at top
+# priority, prefix commands to a small worker pool)
+PIPELINE_WORKERS = 4  # Prefix commands run at once
+PIPELINE_MAX_QUEUE = 1000  # Prefix commands waiting before new ones are dropped
+REPLY_PERMISSION_TTL = 300  # Seconds a channel's "can Froggy talk here" answer is reused
+reply_permissions = {}  # guild_id -> {channel_id: (checked_at, allowed)}
+
+def can_reply_in(message):
+    if message.guild is None:
+        return True
+    now = time.monotonic()
+    channels = reply_permissions.get(message.guild.id)
+    if channels is None:
+        channels = reply_permissions[message.guild.id] = {}
+    cached = channels.get(message.channel.id)
+    if cached is not None and now - cached[0] < REPLY_PERMISSION_TTL:
+        return cached[1]
+    allowed = message.channel.permissions_for(message.guild.me).send_messages
+    channels[message.channel.id] = (now, allowed)
+    return allowed
+
+def sweep_reply_permissions():
+    # Drops expired answers so the cache only holds recently active channels
+    cutoff = time.monotonic() - REPLY_PERMISSION_TTL
+    for guild_id, channels in list(reply_permissions.items()):
+        for channel_id in [c for c, (checked_at, _) in channels.items() if checked_at < cutoff]:
+            del channels[channel_id]
+        if not channels:
+            del reply_permissions[guild_id]
+
+# Permission changes take effect right away instead of after the TTL
+@bot.event
+async def on_guild_channel_update(before, after):
+    reply_permissions.get(after.guild.id, {}).pop(after.id, None)
+
+@bot.event
+async def on_guild_channel_delete(channel):
+    reply_permissions.get(channel.guild.id, {}).pop(channel.id, None)
+
+@bot.event
+async def on_guild_role_update(before, after):
+    reply_permissions.pop(after.guild.id, None)
+
+@bot.event
+async def on_guild_role_delete(role):
+    reply_permissions.pop(role.guild.id, None)
+
+@bot.event
+async def on_member_update(before, after):
+    # Only Froggy's own roles decide where it can talk
+    if after.id == bot.user.id and before.roles != after.roles:
+        reply_permissions.pop(after.guild.id, None)
+
+@bot.event
+async def on_guild_remove(guild):
+    reply_permissions.pop(guild.id, None)
+
+def classify_message(message):
+    # Bots (Froggy included) and channels Froggy can't post in need nothing:
+    # no reply, no moderation message, no history anyone will read. Nothing
+    # new is taken on while shutting down
+    if lifecycle.closing or message.author.bot or not can_reply_in(message):
+        return None
+    return MessageInfo(
+        message,
+        mentions_froggy=bot.user.mentioned_in(message),
+        is_command=message.content.startswith(COMMAND_PREFIX)
+    )
+
+def check_bad_words(info):
+    message = info.message
+    with MODERATION_SECONDS.time(check='bad_words'):
+        is_bad = contains_bad_words(message.content, message.guild.id if message.guild else None)
+    if is_bad:
+        response = random.choice([
+            "Hey, let's keep it friendly! Those words aren't very nice.",
+            "Whoa there! Let's use nicer words please!",
+            "I'd rather not hear those kinds of words. Can we keep it friendly?",
+            "Those words make me uncomfortable. Let's be nice to each other!",
+            "Ribbit! That's not very friendly language!"
+        ])
+        outbound.reply(message, response, priority=MODERATION)
+        return True
+    return False
+
+def check_mean_words(info):
+    # Only matters when the message is aimed at Froggy
+    message = info.message
+    with MODERATION_SECONDS.time(check='mean_words'):
+        is_mean = MEAN_WORDS.contains(message.content)
+    if is_mean:
+        responses = [
+            "Hey, that's not very nice! What did I do to deserve that?",
+            "Those words hurt my feelings... Can we be friends instead?",
+            "I'm just trying to be friendly! Why are you being mean?",
+            "That makes me sad... I just want to spread happiness!",
+            "Even if you're upset, we can talk nicely to each other!"
+        ]
+        outbound.reply(message, random.choice(responses), priority=MODERATION)
+        return True
+    return False
+
+async def run_prefix_command(info):
+    await bot.process_commands(info.message)
+
+def record_history(info):
+    message = info.message
+    update_conversation_history(message.channel.id, message.author.id, message.content)
+    idle_channels.postpone(message.channel.id)
+
+def route_mention(info):
+    message = info.message
+    # Only checked here; tokens are taken once a reply is generated, so cache hits are free
+    throttled = rate_limiter.blocked(message.author.id, message.channel.id, message.guild.id if message.guild else None)
+    if throttled:
+        THROTTLED.inc(scope=throttled)
+        answer_throttled(message)
+    elif not mention_queue.submit(message):
+        print(f"Dropped mention in {message.channel.id}: channel is too busy")
+
+@bot.event
+async def on_message(message):
+    pipeline.handle(message)
+
+def answer_throttled(message):
+    # No Gemini call for throttled mentions; a canned line at most once a
+    # minute per user, and silence after that so spam doesn't turn into sends
+    now = time.monotonic()
+    if throttle_notices.allowed(message.author.id, now):
+        throttle_notices.take(message.author.id, now)
+        greeting = random.choice(FROGGY_TRAITS['greetings'])
+        outbound.reply(message, f"{greeting} {random.choice(FROGGY_TRAITS['busy'])}", priority=FUN)
+
+def build_group_prompt(messages, max_messages=None):
+    parts = [
+        prompt_builder.persona_prefix + "A few friends are talking to you at the same time. Answer all of them in one reply, using their names so everyone knows which part is for them."
+    ]
+    for msg in messages:
+        name = msg.author.display_name
+        parts.append(f"--- {name} ---\n{get_conversation_context(msg.channel.id, msg.author.id, max_messages)}\n{name}: {msg.content}")
+    parts.append("Froggy:")
+    return "\n\n".join(parts)
+
+async def answer_mentions(messages):
+    # Mentions from a burst are answered together with one reply to the newest one
+    message = messages[-1]
+    async with message.channel.typing():
+        try:
+            # Get conversation context
+            settings = settings_for(message.guild)
+            for msg in messages:
+                # Reads anything not in RAM off the event loop
+                await conversation_history.load(msg.channel.id, msg.author.id)
+            use_cache = settings['response_cache'] and len(messages) == 1
+            with PROMPT_BUILD_SECONDS.time():
+                if len(messages) == 1:
+                    history = conversation_history.get(message.channel.id, message.author.id)
+                    context = prompt_builder.build(
+                        (message.channel.id, message.author.id), history, message.content,
+                        max_messages=settings['memory_messages']
+                    )
+                    # Fresh conversations can share replies; ongoing ones only match their own context
+                    cache_context = "" if len(history) <= 1 else context
+                else:
+                    context = build_group_prompt(messages, settings['memory_messages'])
+            
+            cached = response_cache.get(message.content, cache_context) if use_cache else None
+            if cached:
+                # Only counts as answered once Discord has it
+                if await outbound.reply(message, cached) is None:
+                    raise RuntimeError("Couldn't post the cached reply to Discord")
+                clean_response = cached
+            else:
+                # Generate and send the response using Gemini
+                for msg in messages:
+                    rate_limiter.take(msg.author.id, msg.channel.id, msg.guild.id if msg.guild else None)
+                started = time.perf_counter()
+                tier, reason = gemini.choose(message.content, group=len(messages) > 1)
+                if STREAM_REPLIES:
+                    clean_response = await send_streamed_reply(message, context, tier, reason)
+                else:
+                    clean_response = await send_full_reply(message, context, tier, reason)
+                # Streamed replies can span several messages; a cache hit is replayed as one
+                if clean_response and use_cache and len(clean_response) <= DISCORD_MESSAGE_LIMIT:
+                    response_cache.put(message.content, clean_response, cache_context, latency=time.perf_counter() - started)
+            
+            if clean_response:
+                # Update conversation history with Froggy's response
+                for msg in messages:
+                    update_conversation_history(msg.channel.id, msg.author.id, clean_response, is_froggy=True)
                 
-                # Generate response using Gemini
-                response = model.generate_content(context)
+                # Check back in once the channel goes quiet
+                idle_channels.touch(message.channel.id, message.author.id, cooldown=settings['interaction_cooldown'])
                 
-                if response and response.text:
-                    # Clean and send the response
-                    clean_response = response.text.strip().replace('"', '')
-                    await message.reply(clean_response)
-                    
-                    # Update conversation history with Froggy's response
-                    update_conversation_history(message.channel.id, message.author.id, clean_response, is_froggy=True)
-                    
-                    # Update last interaction time
-                    last_interaction[message.channel.id] = time.time()
-                    
-                    # Add random reaction (10% chance)
-                    if random.random() < 0.1:
-                        await message.add_reaction("🐸")
-                else:
-                    fallback = "Hey! What's been happening? Fill me in!"
-                    await message.reply(fallback)
-                    update_conversation_history(message.channel.id, message.author.id, fallback, is_froggy=True)
-            except Exception as e:
-                print(f"Error in Gemini response: {str(e)}")
-                casual = "What's new? Been thinking about our last chat!"
-                await message.reply(casual)
+                # Add random reaction (10% chance)
+                if random.random() < 0.1:
+                    outbound.react(message, "🐸")
+            else:
+                fallback = "Hey! What's been happening? Fill me in!"
+                FALLBACKS.inc(reason='empty')
+                outbound.reply(message, fallback)
+                for msg in messages:
+                    update_conversation_history(msg.channel.id, msg.author.id, fallback, is_froggy=True)
+        except Throttled:
+            # The global limit ran out (or Gemini reported its quota used up) while this was queued
+            THROTTLED.inc(scope='global')
+            answer_throttled(message)
+        except Exception as e:
+            print(f"Error in Gemini response: {str(e)}")
+            ERRORS.inc(where='reply')
+            FALLBACKS.inc(reason='error')
+            casual = "What's new? Been thinking about our last chat!"
+            outbound.reply(message, casual)
+
+# One generation in flight per channel; bursts of mentions get merged
+mention_queue = MentionCoalescer(
+    answer_mentions,
+    window=MENTION_COALESCE_WINDOW,
+    max_batch=MENTION_MAX_BATCH,
+    max_pending=MENTION_MAX_PENDING,
+    policy=MENTION_BACKPRESSURE
+)
+
+pipeline = MessagePipeline(
+    classify_message,
+    workers=PriorityWorkers(workers=PIPELINE_WORKERS, max_queue=PIPELINE_MAX_QUEUE),
+    timer=lambda stage: PIPELINE_SECONDS.bind(stage=stage)
+)
+pipeline.stage('bad_words', check_bad_words)
+pipeline.stage('mean_words', check_mean_words, when=lambda info: info.mentions_froggy)
+pipeline.stage('commands', run_prefix_command, when=lambda info: info.is_command, priority=REPLY)
+pipeline.stage('history', record_history)
+pipeline.stage('mention', route_mention, when=lambda info: info.mentions_froggy)
 
 @bot.command(name='froggyhelp')
 async def froggy_help(ctx):
@@ -278,7 +766,7 @@ async def froggy_help(ctx):
 @app_commands.checks.has_permissions(administrator=True)
 async def shutdown(interaction: discord.Interaction):
     await interaction.response.send_message("Ribbit... time for a nap! 💤")
-    await bot.close()
+    await shutdown_bot('/shutdown')
 
 @shutdown.error
 async def shutdown_error(interaction: discord.Interaction, error):
@@ -303,10 +791,10 @@ async def annoy(interaction: discord.Interaction, target: discord.Member, times:
     
     await interaction.response.send_message(f"Time to annoy {target.mention}! 😈🐸", ephemeral=True)
     
+    # Queued and paced by the dispatcher, so the command returns right away
     for _ in range(times):
         message = random.choice(annoying_messages)
-        await interaction.channel.send(f"{target.mention} {message}")
-        await asyncio.sleep(2)
+        outbound.send(interaction.channel, f"{target.mention} {message}", priority=FUN, mergeable=True)
 
 @annoy.error
 async def annoy_error(interaction: discord.Interaction, error):
@@ -394,25 +882,13 @@ async def command_error(interaction: discord.Interaction, error):
     await interaction.response.send_message("Oops! Something went wrong. Try again! 🐸", ephemeral=True)
 
 # Add these new functions
-async def handle_bad_message(message):
-    if contains_bad_words(message.content):
-        response = random.choice([
-            "Hey, let's keep it friendly! Those words aren't very nice.",
-            "Whoa there! Let's use nicer words please!",
-            "I'd rather not hear those kinds of words. Can we keep it friendly?",
-            "Those words make me uncomfortable. Let's be nice to each other!",
-            "Ribbit! That's not very friendly language!"
-        ])
-        await message.reply(response)
-        return True
-    return False
-
 async def send_staff_report(guild, reporter, reported_user, message_content, reason, channel_id):
     # Find staff channel
-    if not STAFF_CHANNEL_ID:
+    staff_channel_id = settings_for(guild)['staff_channel_id']
+    if not staff_channel_id:
         return "No staff channel set! Ask an admin to use /setstaff first!"
     
-    staff_channel = guild.get_channel(STAFF_CHANNEL_ID)
+    staff_channel = guild.get_channel(staff_channel_id)
     if not staff_channel:
         return "Couldn't find the staff channel! Ask an admin to use /setstaff!"
 
@@ -425,18 +901,15 @@ async def send_staff_report(guild, reporter, reported_user, message_content, rea
     embed.add_field(name="Channel", value=f"<#{channel_id}>", inline=False)
     embed.timestamp = datetime.utcnow()
 
-    try:
-        await staff_channel.send(embed=embed)
+    if await outbound.send(staff_channel, embed=embed, priority=MODERATION) is not None:
         return "Report sent to staff! Thank you for helping keep the server friendly! 🐸"
-    except:
-        return "Couldn't send the report to staff! Make sure I have permission to send messages in the staff channel!"
+    return "Couldn't send the report to staff! Make sure I have permission to send messages in the staff channel!"
 
 # Add these new commands
 @bot.tree.command(name="setstaff", description="Set the channel for staff reports (Admin only)")
 @app_commands.checks.has_permissions(administrator=True)
 async def setstaff(interaction: discord.Interaction, channel: discord.TextChannel):
-    global STAFF_CHANNEL_ID
-    STAFF_CHANNEL_ID = channel.id
+    guild_config.set(interaction.guild.id, 'staff_channel_id', channel.id)
     await interaction.response.send_message(f"Staff reports will now be sent to {channel.mention}! 🛡️", ephemeral=True)
 
 @setstaff.error
@@ -456,6 +929,9 @@ async def report(
     reason: str,
     message: str
 ):
+    # The staff channel's queue may be backed up; defer so the interaction
+    # doesn't hit Discord's 3 second deadline while the report waits its turn
+    await interaction.response.defer(ephemeral=True)
     response = await send_staff_report(
         interaction.guild,
         interaction.user,
@@ -464,7 +940,70 @@ async def report(
         reason,
         interaction.channel.id
     )
-    await interaction.response.send_message(response, ephemeral=True)
+    await interaction.followup.send(response, ephemeral=True)
+
+@bot.tree.command(name="config", description="Show or change Froggy's settings for this server (Admin only)")
+@app_commands.checks.has_permissions(administrator=True)
+@app_commands.describe(setting="Which setting to change", value="The new value (leave empty to reset it)")
+@app_commands.choices(setting=[
+    app_commands.Choice(name=description, value=key) for key, (description, _) in CONFIG_SETTINGS.items()
+])
+async def config(
+    interaction: discord.Interaction,
+    setting: Optional[app_commands.Choice[str]] = None,
+    value: Optional[str] = None
+):
+    guild_id = interaction.guild.id
+    if setting is None:
+        settings = guild_config.get(guild_id)
+        lines = [f"• `{key}`: {settings[key]} - {description}" for key, (description, _) in CONFIG_SETTINGS.items()]
+        await interaction.response.send_message("🐸 **Froggy's settings**\n" + "\n".join(lines), ephemeral=True)
+        return
+    if value is None:
+        guild_config.reset(guild_id, setting.value)
+        await interaction.response.send_message(f"`{setting.value}` is back to its default! 🐸", ephemeral=True)
+        return
+    try:
+        parsed = guild_config.parse(setting.value, value)
+    except ValueError as e:
+        await interaction.response.send_message(f"Hmm, that didn't work: {str(e)}", ephemeral=True)
+        return
+    guild_config.set(guild_id, setting.value, parsed)
+    await interaction.response.send_message(f"`{setting.value}` is now {parsed}! 🐸", ephemeral=True)
+
+@bot.tree.command(name="badwords", description="Manage this server's extra filtered words (Admin only)")
+@app_commands.checks.has_permissions(administrator=True)
+@app_commands.describe(action="What to do", word="The word to add or remove")
+@app_commands.choices(action=[
+    app_commands.Choice(name="add", value="add"),
+    app_commands.Choice(name="remove", value="remove"),
+    app_commands.Choice(name="list", value="list")
+])
+async def badwords(interaction: discord.Interaction, action: app_commands.Choice[str], word: Optional[str] = None):
+    guild_id = interaction.guild.id
+    words = list(guild_config.value(guild_id, 'bad_words'))
+    if action.value == "list":
+        listed = ", ".join(f"||{w}||" for w in words) or "None yet!"
+        await interaction.response.send_message(f"Extra filtered words: {listed}", ephemeral=True)
+        return
+    if not word or not word.strip():
+        await interaction.response.send_message("Tell me which word!", ephemeral=True)
+        return
+    word = word.strip().lower()
+    if action.value == "add" and word not in words:
+        words.append(word)
+    elif action.value == "remove" and word in words:
+        words.remove(word)
+    guild_config.set(guild_id, 'bad_words', words)
+    await interaction.response.send_message(f"Got it! This server now has {len(words)} extra filtered word(s). 🛡️", ephemeral=True)
+
+@config.error
+@badwords.error
+async def admin_command_error(interaction: discord.Interaction, error):
+    if isinstance(error, app_commands.errors.MissingPermissions):
+        await interaction.response.send_message("Only administrators can change Froggy's settings!", ephemeral=True)
+    else:
+        await interaction.response.send_message("Oops! Something went wrong. Try again! 🐸", ephemeral=True)
 
 # Add to your help command
 @bot.tree.command(name="help", description="Show all available commands")
@@ -480,6 +1019,8 @@ async def help(interaction: discord.Interaction):
 • `/annoy` - Playfully annoy someone
 • `/report` - Report a message to staff
 • `/setstaff` - Set staff channel (Admin only)
+• `/config` - Show or change server settings (Admin only)
+• `/badwords` - Manage extra filtered words (Admin only)
 • `/shutdown` - Shutdown the bot (Admin only)
 
 🛡️ **Moderation Features** 🛡️
@@ -489,7 +1030,112 @@ async def help(interaction: discord.Interaction):
     """
     await interaction.response.send_message(help_text)
 
+# Shutdown and restarts. SIGTERM (what the launcher and process managers
+# send), Ctrl+C and /shutdown all let in-flight replies finish, then save the
+# state that only lives in memory to a snapshot the next start reloads.
+# Conversations themselves are flushed to the memory database
+SHUTDOWN_DRAIN_TIMEOUT = 10  # Seconds in-flight replies get; the launcher kills after 30
+SNAPSHOT_PATH = os.getenv('FROGGY_STATE_SNAPSHOT', 'froggy_state.bin')
+if SHARD_IDS:
+    # Each shard process keeps its own
+    root, ext = os.path.splitext(SNAPSHOT_PATH)
+    SNAPSHOT_PATH = f"{root}.{SHARD_IDS[0]}{ext}"
+IDLE_SNAPSHOT_MAX_AGE = 3600  # Idle check-ins from an older snapshot aren't restored
+
+lifecycle = Lifecycle(drain_timeout=SHUTDOWN_DRAIN_TIMEOUT)
+
+def save_state():
+    started = time.perf_counter()
+    sections = {
+        'idle': idle_channels.export_state(),
+        'throttle_notices': throttle_notices.export_state(),
+        'summaries': prompt_builder.export_state()
+    }
+    for scope, entries in rate_limiter.export_state().items():
+        sections[f'rate_{scope}'] = entries
+    size = state_snapshot.save(SNAPSHOT_PATH, sections)
+    print(f"Saved state snapshot to {SNAPSHOT_PATH} ({size} bytes, "
+          f"{sum(len(entries) for entries in sections.values())} entries) in {time.perf_counter() - started:.3f}s")
+
+def load_state():
+    saved_at, sections = state_snapshot.load(SNAPSHOT_PATH)
+    if saved_at is None:
+        return
+    if time.time() - saved_at < IDLE_SNAPSHOT_MAX_AGE:
+        idle_channels.import_state(sections.get('idle', []))
+    rate_limiter.import_state({scope: sections.get(f'rate_{scope}', []) for scope in rate_limiter.buckets})
+    throttle_notices.import_state(sections.get('throttle_notices', []))
+    prompt_builder.import_state(sections.get('summaries', []))
+    print(f"Restored state from {SNAPSHOT_PATH}: {len(idle_channels)} idle channel(s), "
+          f"{len(sections.get('summaries', []))} conversation summaries")
+
+lifecycle.add_drain_check('mentions', mention_queue.active_channels)
+lifecycle.add_drain_check('prefix_commands', lambda: pipeline.workers.pending() + pipeline.workers.active)
+lifecycle.add_drain_check('discord_sends', outbound.pending)
+lifecycle.add_drain_check('idle_followups', idle_channels.in_flight)
+lifecycle.add_drain_check('summaries', prompt_builder.pending_summaries)
+lifecycle.on_shutdown('message pipeline', pipeline.close)
+lifecycle.on_shutdown('mention queue', mention_queue.close)
+# Anything still calling Gemini is stopped before the queues and executors it uses close
+lifecycle.on_shutdown('idle follow-ups', idle_channels.close)
+lifecycle.on_shutdown('summaries', prompt_builder.close)
+lifecycle.on_shutdown('outbound queue', outbound.close)
+lifecycle.on_shutdown('state snapshot', save_state)
+lifecycle.on_shutdown('gemini', gemini.close)
+lifecycle.on_shutdown('conversation memory', lambda: conversation_history.close())
+lifecycle.on_shutdown('guild settings', lambda: guild_config.close())
+lifecycle.on_shutdown('discord', bot.close)
+
+async def shutdown_bot(reason):
+    await lifecycle.shutdown(reason)
+
+startup.checkpoint('definitions')
+
+def create_app():
+    # Everything starting Froggy does beyond defining things: logging, the
+    # environment check and opening the conversation and settings stores.
+    # Returns the bot, ready for bot.run(DISCORD_TOKEN, log_handler=None)
+    global conversation_history, guild_config
+    logging.basicConfig(level=LOG_LEVEL)
+    logging.getLogger('discord').setLevel(LOG_LEVEL)
+
+    if not DISCORD_TOKEN or not GEMINI_API_KEY:
+        print("Error: Missing required environment variables!")
+        print("Make sure you have a .env file with:")
+        print("DISCORD_TOKEN=your_token_here")
+        print("GEMINI_API_KEY=your_key_here")
+        raise ValueError("Missing required environment variables. Please check your .env file.")
+
+    imports = startup.seconds('imports')
+    if imports > IMPORT_BUDGET:
+        print(f"Warning: imports took {imports:.2f}s (budget {IMPORT_BUDGET:.2f}s). "
+              f"Run benchmarks/bench_startup.py to see which modules are slow")
+    startup.checkpoint('config')
+
+    conversation_history = ConversationMemory(
+        SQLiteBackend(MEMORY_DB_PATH),
+        max_messages=MAX_MEMORY_MESSAGES,
+        max_conversations=MAX_CONVERSATIONS,
+        ttl=MEMORY_TTL
+    )
+    guild_config = GuildConfigStore(
+        CONFIG_DB_PATH,
+        GUILD_DEFAULTS,
+        parsers={key: parse for key, (_, parse) in CONFIG_SETTINGS.items()}
+    )
+    moderation.load()
+    guild_config.on_change(apply_guild_settings)
+    for guild_id in guild_config.guilds():
+        apply_guild_settings(guild_id, guild_config.get(guild_id))
+    startup.checkpoint('stores')
+
+    load_state()
+    startup.checkpoint('snapshot')
+    return bot
+
 # Run the bot
 if __name__ == "__main__":
     print("Starting Froggy...")
-    bot.run(DISCORD_TOKEN) 
\ No newline at end of file
+    # Logging is already set up by create_app(); without log_handler=None
+    # discord.py adds its own handler and resets the level to INFO
+    create_app().run(DISCORD_TOKEN, log_handler=None)
@@ -0,0 +1,142 @@
+# Runs Froggy as several processes, each owning a range of shards. All of them
+# share the same conversation database, so whichever process owns a guild's
+# shard can answer there.
+#
+#   python froggy_launcher.py                  # size everything automatically
+#   python froggy_launcher.py --shards 16 --processes 4
+#   python froggy_launcher.py --dry-run        # just print the plan
+import argparse
+import json
+import os
+import signal
+import subprocess
+import sys
+import time
+import urllib.request
+
+from dotenv import load_dotenv
+
+BOT_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'froggy_bot.py')
+IDENTIFY_INTERVAL = 5  # Seconds Discord wants between shard logins per concurrency bucket
+RESTART_DELAY = 5  # Seconds to wait before restarting a crashed process
+
+
+def fetch_gateway_info(token):
+    # Discord recommends a shard count for the bot's current guild count
+    request = urllib.request.Request(
+        'https://discord.com/api/v10/gateway/bot',
+        headers={
+            'Authorization': f'Bot {token}',
+            'User-Agent': 'DiscordBot (https://github.com/ballv12/Froggy, 1.0)'
+        }
+    )
+    with urllib.request.urlopen(request, timeout=10) as response:
+        data = json.load(response)
+    return data['shards'], data.get('session_start_limit', {}).get('max_concurrency', 1)
+
+
+def split_shards(shard_count, processes):
+    # Contiguous, evenly sized ranges: 10 shards over 3 processes -> 4, 3, 3
+    processes = max(1, min(processes, shard_count))
+    base, extra = divmod(shard_count, processes)
+    ranges = []
+    start = 0
+    for i in range(processes):
+        size = base + (1 if i < extra else 0)
+        ranges.append(list(range(start, start + size)))
+        start += size
+    return ranges
+
+
+class ShardProcess:
+    def __init__(self, shard_ids, shard_count):
+        self.shard_ids = shard_ids
+        self.shard_count = shard_count
+        self.process = None
+        self.restarts = 0
+
+    def start(self):
+        env = dict(os.environ)
+        env['FROGGY_SHARD_COUNT'] = str(self.shard_count)
+        env['FROGGY_SHARD_IDS'] = ','.join(str(i) for i in self.shard_ids)
+        self.process = subprocess.Popen([sys.executable, BOT_SCRIPT], env=env)
+        print(f"Started shards {self.shard_ids[0]}-{self.shard_ids[-1]} (pid {self.process.pid})")
+
+    def stop(self):
+        if self.process and self.process.poll() is None:
+            self.process.terminate()
+
+    def wait(self, timeout):
+        if self.process:
+            try:
+                self.process.wait(timeout)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run Froggy across several shard processes")
+    parser.add_argument('--shards', type=int, help="Total shard count (default: Discord's recommendation)")
+    parser.add_argument('--processes', type=int, help="Processes to run (default: one per CPU core)")
+    parser.add_argument('--dry-run', action='store_true', help="Print the shard plan and exit")
+    args = parser.parse_args()
+
+    load_dotenv()
+    max_concurrency = 1
+    shard_count = args.shards
+    if shard_count is None:
+        token = os.getenv('DISCORD_TOKEN')
+        if not token:
+            raise ValueError("Missing DISCORD_TOKEN. Please check your .env file.")
+        shard_count, max_concurrency = fetch_gateway_info(token)
+
+    processes = args.processes or os.cpu_count() or 1
+    plan = [ShardProcess(ids, shard_count) for ids in split_shards(shard_count, processes)]
+    print(f"=== {shard_count} shard(s) across {len(plan)} process(es) ===")
+    for worker in plan:
+        print(f"- shards {worker.shard_ids}")
+    if args.dry_run:
+        return
+
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+
+    # Stagger logins so the processes don't trip Discord's identify limit
+    for worker in plan:
+        if stopping:
+            break
+        worker.start()
+        time.sleep(IDENTIFY_INTERVAL * len(worker.shard_ids) / max_concurrency)
+
+    while not stopping:
+        time.sleep(1)
+        running = 0
+        for worker in plan:
+            code = worker.process.poll() if worker.process else None
+            if code is None:
+                running += 1
+            elif code != 0 and not stopping:
+                # A clean exit (e.g. /shutdown) is left alone; crashes get restarted
+                print(f"Shards {worker.shard_ids} exited with code {code}, restarting...")
+                worker.restarts += 1
+                time.sleep(RESTART_DELAY)
+                worker.start()
+                running += 1
+        if not running:
+            break
+
+    print("Stopping shard processes...")
+    for worker in plan:
+        worker.stop()
+    for worker in plan:
+        worker.wait(timeout=30)
+
+
+if __name__ == "__main__":
+    main()
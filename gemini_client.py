@@ -0,0 +1,138 @@
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from importlib import metadata
+
+# Defaults for Gemini calls
+DEFAULT_MAX_CONCURRENCY = 8  # Gemini calls allowed in flight at once
+DEFAULT_TIMEOUT = 30  # Seconds before a generation is given up on
+
+
+def supports_system_instruction():
+    # system_instruction arrived in google-generativeai 0.5. Checked from the
+    # package metadata so the answer doesn't cost importing the SDK
+    try:
+        version = metadata.version("google-generativeai")
+    except metadata.PackageNotFoundError:
+        return False
+    parts = []
+    for part in version.split(".")[:2]:
+        if not part.isdigit():
+            break
+        parts.append(int(part))
+    return tuple(parts) >= (0, 5)
+
+
+class GeminiClient:
+    # Wraps a genai.GenerativeModel so generation never blocks the event loop.
+    # Uses the SDK's async API when it has one, otherwise a bounded thread pool.
+    # Pass load_model instead of a model to build it on first use (or warm()),
+    # so importing the bot doesn't pay for importing the SDK.
+    def __init__(self, model=None, max_concurrency=DEFAULT_MAX_CONCURRENCY, timeout=DEFAULT_TIMEOUT,
+                 load_model=None):
+        self._model = model
+        self.load_model = load_model
+        self._load_lock = threading.Lock()
+        self.timeout = timeout
+        self.max_concurrency = max_concurrency
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._threads = None  # Started on first use, so constructing a client starts no threads
+        self.in_flight = 0
+
+    @property
+    def _executor(self):
+        if self._threads is None:
+            self._threads = ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix="gemini")
+        return self._threads
+
+    @property
+    def model(self):
+        if self._model is None:
+            with self._load_lock:
+                if self._model is None:
+                    self._model = self.load_model()
+        return self._model
+
+    @model.setter
+    def model(self, model):
+        self._model = model
+
+    async def warm(self):
+        # Build the model off the event loop before the first message needs it
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self._executor, lambda: self.model)
+
+    async def generate(self, prompt, timeout=None, **kwargs):
+        # Waiting for a free slot counts against the timeout too, so a backed-up
+        # pool fails fast instead of piling up callers
+        timeout = self.timeout if timeout is None else timeout
+        return await asyncio.wait_for(self._generate(prompt, **kwargs), timeout)
+
+    async def _generate(self, prompt, **kwargs):
+        async with self._semaphore:
+            self.in_flight += 1
+            try:
+                return await self._call(prompt, **kwargs)
+            finally:
+                self.in_flight -= 1
+
+    async def _call(self, prompt, **kwargs):
+        generate_async = getattr(self.model, "generate_content_async", None)
+        if generate_async is not None:
+            return await generate_async(prompt, **kwargs)
+        # Older SDKs only have the blocking call; the pool is sized to the
+        # semaphore so a timed-out call can't grow the thread count
+        loop = asyncio.get_running_loop()
+        call = functools.partial(self.model.generate_content, prompt, **kwargs)
+        return await loop.run_in_executor(self._executor, call)
+
+    async def stream(self, prompt, timeout=None, **kwargs):
+        # Yields text chunks as Gemini produces them. The timeout applies to the
+        # gap between chunks so long replies aren't cut off mid-stream
+        timeout = self.timeout if timeout is None else timeout
+        await asyncio.wait_for(self._semaphore.acquire(), timeout)
+        self.in_flight += 1
+        try:
+            generate_async = getattr(self.model, "generate_content_async", None)
+            if generate_async is not None:
+                response = await asyncio.wait_for(generate_async(prompt, stream=True, **kwargs), timeout)
+                chunks = response.__aiter__()
+                next_chunk = chunks.__anext__
+            else:
+                loop = asyncio.get_running_loop()
+                call = functools.partial(self.model.generate_content, prompt, stream=True, **kwargs)
+                response = await asyncio.wait_for(loop.run_in_executor(self._executor, call), timeout)
+                chunks = iter(response)
+                next_chunk = functools.partial(loop.run_in_executor, self._executor, _next_or_stop, chunks)
+            while True:
+                try:
+                    chunk = await asyncio.wait_for(next_chunk(), timeout)
+                except StopAsyncIteration:
+                    break
+                text = _chunk_text(chunk)
+                if text:
+                    yield text
+        finally:
+            self.in_flight -= 1
+            self._semaphore.release()
+
+    def close(self):
+        if self._threads is not None:
+            self._threads.shutdown(wait=False, cancel_futures=True)
+
+
+def _next_or_stop(chunks):
+    # StopIteration can't cross an executor future, so translate it
+    try:
+        return next(chunks)
+    except StopIteration:
+        raise StopAsyncIteration
+
+
+def _chunk_text(chunk):
+    # .text raises when a chunk has no parts (e.g. a safety block)
+    try:
+        return chunk.text
+    except ValueError:
+        return ""
@@ -0,0 +1,106 @@
+import json
+import sqlite3
+
+
+def parse_bool(text):
+    value = text.strip().lower()
+    if value in ('on', 'yes', 'true', 'enable', 'enabled', '1'):
+        return True
+    if value in ('off', 'no', 'false', 'disable', 'disabled', '0'):
+        return False
+    raise ValueError("Use on or off")
+
+
+def int_between(low, high):
+    def parse(text):
+        try:
+            value = int(text.strip())
+        except ValueError:
+            raise ValueError("That needs to be a whole number")
+        if not low <= value <= high:
+            raise ValueError(f"Pick a number from {low} to {high}")
+        return value
+    return parse
+
+
+class GuildConfigStore:
+    # Per-guild settings stored in SQLite. Every guild's overrides are read
+    # into memory once at startup, so get() is a plain dict lookup; writes go
+    # to disk and replace the cached entry straight away. Listeners registered
+    # with on_change(fn) are called as fn(guild_id, settings) after a write.
+    def __init__(self, path, defaults, parsers=None):
+        self.defaults = dict(defaults)
+        self.parsers = parsers or {}
+        # Shard processes share the file, so wait on each other's write locks
+        self.conn = sqlite3.connect(path, timeout=10)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS guild_config ("
+            "guild_id INTEGER NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, "
+            "PRIMARY KEY (guild_id, key))"
+        )
+        self.conn.commit()
+        self._cache = {}
+        self._listeners = []
+        self.reload()
+
+    def reload(self):
+        cache = {}
+        for guild_id, key, value in self.conn.execute("SELECT guild_id, key, value FROM guild_config"):
+            if key not in self.defaults:
+                continue
+            settings = cache.get(guild_id)
+            if settings is None:
+                settings = cache[guild_id] = dict(self.defaults)
+            settings[key] = json.loads(value)
+        self._cache = cache
+        return len(cache)
+
+    def guilds(self):
+        return list(self._cache)
+
+    def get(self, guild_id):
+        # Guilds without overrides share the defaults dict; treat it as read-only
+        return self._cache.get(guild_id, self.defaults)
+
+    def value(self, guild_id, key):
+        return self.get(guild_id)[key]
+
+    def parse(self, key, text):
+        parser = self.parsers.get(key)
+        return parser(text) if parser else text
+
+    def set(self, guild_id, key, value):
+        if key not in self.defaults:
+            raise KeyError(key)
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO guild_config VALUES (?, ?, ?)", (guild_id, key, json.dumps(value))
+            )
+        settings = dict(self.get(guild_id))
+        settings[key] = value
+        self._cache[guild_id] = settings
+        self._notify(guild_id, settings)
+
+    def reset(self, guild_id, key):
+        if key not in self.defaults:
+            raise KeyError(key)
+        with self.conn:
+            self.conn.execute("DELETE FROM guild_config WHERE guild_id = ? AND key = ?", (guild_id, key))
+        settings = dict(self.get(guild_id))
+        settings[key] = self.defaults[key]
+        self._cache[guild_id] = settings
+        self._notify(guild_id, settings)
+
+    def on_change(self, listener):
+        self._listeners.append(listener)
+
+    def _notify(self, guild_id, settings):
+        for listener in self._listeners:
+            try:
+                listener(guild_id, settings)
+            except Exception as e:
+                print(f"Error applying settings for guild {guild_id}: {str(e)}")
+
+    def close(self):
+        self.conn.close()
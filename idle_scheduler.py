@@ -0,0 +1,137 @@
+import asyncio
+import heapq
+import random
+import time
+
+DEFAULT_COOLDOWN = 300  # Seconds of quiet before Froggy checks back in
+DEFAULT_JITTER = 60  # Up to this many extra seconds, so channels don't all fire together
+DEFAULT_RATE = 10  # Follow-ups allowed per DEFAULT_PER seconds across all channels
+DEFAULT_PER = 60
+
+
+class IdleScheduler:
+    # Calls callback(channel_id, user_id) once a channel Froggy talked in has
+    # been quiet for `cooldown` seconds. Each tracked channel has one entry in
+    # a heap ordered by deadline, and run() sleeps until the earliest one, so
+    # idle channels cost nothing between deadlines. While paused() returns
+    # True nothing fires and due channels stay tracked.
+    def __init__(self, callback, cooldown=DEFAULT_COOLDOWN, jitter=DEFAULT_JITTER,
+                 rate=DEFAULT_RATE, per=DEFAULT_PER, paused=None):
+        self.callback = callback
+        self.paused = paused
+        self.cooldown = cooldown
+        self.jitter = jitter
+        self.rate = rate
+        self.per = per
+        self._heap = []  # (deadline, channel_id)
+        self._channels = {}  # channel_id -> [last_activity, user_id, deadline, cooldown]
+        self._wakeup = asyncio.Event()
+        self._tokens = float(rate)
+        self._refilled = time.time()
+        self._tasks = {}  # Follow-ups in progress: task -> (channel_id, entry)
+        self._running = False
+
+    def __len__(self):
+        return len(self._channels)
+
+    def touch(self, channel_id, user_id, cooldown=None):
+        # Froggy just talked with user_id here; check back once it goes quiet
+        now = time.time()
+        cooldown = self.cooldown if cooldown is None else cooldown
+        entry = self._channels.get(channel_id)
+        if entry is None:
+            entry = self._channels[channel_id] = [now, user_id, None, cooldown]
+            self._schedule(channel_id, entry, now + cooldown)
+        else:
+            entry[0] = now
+            entry[1] = user_id
+            entry[3] = cooldown
+
+    def postpone(self, channel_id):
+        # Someone is still talking, so the channel isn't idle yet
+        entry = self._channels.get(channel_id)
+        if entry is not None:
+            entry[0] = time.time()
+
+    def in_flight(self):
+        return len(self._tasks)
+
+    async def close(self):
+        # Cancels follow-ups still in progress. Their channels go back to
+        # being tracked, so a snapshot taken afterwards keeps them
+        tasks = list(self._tasks.items())
+        for task, (channel_id, entry) in tasks:
+            task.cancel()
+            self._channels.setdefault(channel_id, entry)
+        await asyncio.gather(*(task for task, _ in tasks), return_exceptions=True)
+
+    def forget(self, channel_id):
+        self._channels.pop(channel_id, None)
+
+    def export_state(self):
+        # (channel_id, user_id, last_activity, cooldown) per tracked channel
+        return [(channel_id, entry[1], entry[0], entry[3]) for channel_id, entry in self._channels.items()]
+
+    def import_state(self, entries):
+        # Channels that went quiet while Froggy was down fire on the next run()
+        for channel_id, user_id, last_activity, cooldown in entries:
+            if channel_id not in self._channels:
+                entry = self._channels[channel_id] = [last_activity, user_id, None, cooldown]
+                self._schedule(channel_id, entry, last_activity + cooldown)
+
+    def _schedule(self, channel_id, entry, when):
+        deadline = when + random.uniform(0, self.jitter)
+        entry[2] = deadline
+        heapq.heappush(self._heap, (deadline, channel_id))
+        if self._heap[0][1] == channel_id:
+            self._wakeup.set()
+
+    def _take_token(self, now):
+        self._tokens = min(self.rate, self._tokens + (now - self._refilled) * self.rate / self.per)
+        self._refilled = now
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return True
+        return False
+
+    async def run(self):
+        if self._running:
+            return
+        self._running = True
+        try:
+            while True:
+                timeout = max(0.0, self._heap[0][0] - time.time()) if self._heap else None
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+                self._fire_due()
+        finally:
+            self._running = False
+
+    def _fire_due(self):
+        now = time.time()
+        while self._heap and self._heap[0][0] <= now:
+            deadline, channel_id = heapq.heappop(self._heap)
+            entry = self._channels.get(channel_id)
+            if entry is None or entry[2] != deadline:
+                continue
+            quiet_until = entry[0] + entry[3]
+            if quiet_until > now:
+                # There was activity after this was scheduled
+                self._schedule(channel_id, entry, quiet_until)
+            elif (self.paused is not None and self.paused()) or not self._take_token(now):
+                self._schedule(channel_id, entry, now + self.per / self.rate)
+            else:
+                # Fire once; the channel is tracked again the next time Froggy talks there
+                del self._channels[channel_id]
+                task = asyncio.create_task(self._fire(channel_id, entry[1]))
+                self._tasks[task] = (channel_id, entry)
+                task.add_done_callback(lambda done: self._tasks.pop(done, None))
+
+    async def _fire(self, channel_id, user_id):
+        try:
+            await self.callback(channel_id, user_id)
+        except Exception as e:
+            print(f"Error in random interaction: {str(e)}")
@@ -0,0 +1,111 @@
+import asyncio
+import inspect
+import signal
+import time
+
+DEFAULT_DRAIN_TIMEOUT = 10  # Seconds shutdown waits for in-flight work
+DEFAULT_RESTART_DELAY = 1  # First wait before a crashed background task is restarted
+MAX_RESTART_DELAY = 60
+
+
+class Lifecycle:
+    # Owns the bot's background tasks and its shutdown. spawn(name, fn) runs
+    # fn() as the one task with that name, restarting it if it crashes, so
+    # calling spawn again (e.g. from on_ready after a reconnect) doesn't start
+    # a duplicate. shutdown() stops taking new work, waits up to drain_timeout
+    # for every drain check to reach zero, cancels the background tasks and
+    # then runs the shutdown hooks in the order they were added.
+    def __init__(self, drain_timeout=DEFAULT_DRAIN_TIMEOUT):
+        self.drain_timeout = drain_timeout
+        self.closing = False
+        self._tasks = {}  # name -> supervisor task
+        self._drain_checks = []  # (name, fn returning how much work is left)
+        self._hooks = []  # (name, fn), sync or async
+        self._shutdown = None
+
+    def spawn(self, name, fn, restart=True):
+        task = self._tasks.get(name)
+        if task is not None and not task.done():
+            return task
+        task = self._tasks[name] = asyncio.create_task(self._supervise(name, fn, restart), name=f"froggy:{name}")
+        return task
+
+    async def _supervise(self, name, fn, restart):
+        delay = DEFAULT_RESTART_DELAY
+        while True:
+            started = time.monotonic()
+            try:
+                await fn()
+                return
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Background task {name} crashed: {str(e)}")
+                if not restart or self.closing:
+                    return
+            # Back off while it keeps crashing straight away
+            delay = DEFAULT_RESTART_DELAY if time.monotonic() - started > MAX_RESTART_DELAY else min(delay * 2, MAX_RESTART_DELAY)
+            await asyncio.sleep(delay)
+
+    def running(self):
+        return sorted(name for name, task in self._tasks.items() if not task.done())
+
+    def add_drain_check(self, name, fn):
+        self._drain_checks.append((name, fn))
+
+    def on_shutdown(self, name, fn):
+        self._hooks.append((name, fn))
+
+    def install_signal_handlers(self, on_signal):
+        # on_signal(name) is called from the event loop on SIGTERM or SIGINT
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            try:
+                loop.add_signal_handler(sig, on_signal, sig.name)
+            except (NotImplementedError, RuntimeError):
+                pass  # Not available on Windows; Ctrl+C still stops the bot there
+
+    def remaining(self):
+        left = {}
+        for name, fn in self._drain_checks:
+            try:
+                count = fn()
+            except Exception as e:
+                print(f"Error checking {name} during shutdown: {str(e)}")
+                continue
+            if count:
+                left[name] = count
+        return left
+
+    async def shutdown(self, reason=""):
+        # Safe to call more than once; later callers wait for the first
+        if self._shutdown is None:
+            self._shutdown = asyncio.ensure_future(self._run_shutdown(reason))
+        await asyncio.shield(self._shutdown)
+
+    async def _run_shutdown(self, reason):
+        started = time.monotonic()
+        self.closing = True
+        print(f"Shutting down{f' ({reason})' if reason else ''}...")
+
+        deadline = started + self.drain_timeout
+        left = self.remaining()
+        while left and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+            left = self.remaining()
+        if left:
+            print(f"Gave up waiting after {self.drain_timeout}s, still in progress: {left}")
+
+        tasks = [task for task in self._tasks.values() if not task.done()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+        for name, fn in self._hooks:
+            try:
+                result = fn()
+                if inspect.isawaitable(result):
+                    await result
+            except Exception as e:
+                print(f"Error during shutdown ({name}): {str(e)}")
+        print(f"Shutdown complete in {time.monotonic() - started:.2f}s")
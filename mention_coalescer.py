@@ -0,0 +1,86 @@
+import asyncio
+from collections import deque
+
+# Backpressure policies for a busy channel
+MERGE = "merge"  # Answer everyone waiting in one combined reply
+DEFER = "defer"  # Queue mentions and answer them one at a time
+DROP = "drop"  # Ignore mentions while a reply is already being generated
+POLICIES = (MERGE, DEFER, DROP)
+
+
+class _ChannelQueue:
+    def __init__(self):
+        self.pending = deque()
+        self.worker = None
+        self.busy = False
+
+
+class MentionCoalescer:
+    # Keeps at most one generation in flight per channel. Mentions that arrive
+    # within `window` seconds of each other (or while a reply is being written)
+    # are handed to `handler` together as a list of messages.
+    def __init__(self, handler, window=0.5, max_batch=5, max_pending=20, policy=MERGE):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown backpressure policy: {policy}")
+        self.handler = handler
+        self.window = window
+        self.max_batch = max_batch
+        self.max_pending = max_pending
+        self.policy = policy
+        self.channels = {}
+        self.dropped = 0
+        self.batches = 0
+
+    def submit(self, message):
+        # Returns False when the mention was dropped by backpressure
+        channel_id = message.channel.id
+        queue = self.channels.get(channel_id)
+        if queue is None:
+            queue = self.channels[channel_id] = _ChannelQueue()
+
+        if self.policy == DROP and queue.busy:
+            self.dropped += 1
+            return False
+        if len(queue.pending) >= self.max_pending:
+            self.dropped += 1
+            return False
+
+        queue.pending.append(message)
+        if queue.worker is None:
+            queue.worker = asyncio.create_task(self._run(channel_id, queue))
+        return True
+
+    async def _run(self, channel_id, queue):
+        try:
+            while queue.pending:
+                # Give the burst a moment to arrive before answering
+                if self.window:
+                    await asyncio.sleep(self.window)
+                batch_size = 1 if self.policy == DEFER else self.max_batch
+                batch = [queue.pending.popleft() for _ in range(min(batch_size, len(queue.pending)))]
+                queue.busy = True
+                self.batches += 1
+                try:
+                    await self.handler(batch)
+                except Exception as e:
+                    print(f"Error answering mentions in {channel_id}: {str(e)}")
+                finally:
+                    queue.busy = False
+        finally:
+            queue.worker = None
+            if not queue.pending:
+                self.channels.pop(channel_id, None)
+
+    def pending_count(self):
+        return sum(len(queue.pending) for queue in self.channels.values())
+
+    def active_channels(self):
+        # Channels with mentions waiting or a reply being written
+        return len(self.channels)
+
+    async def close(self):
+        workers = [queue.worker for queue in self.channels.values() if queue.worker]
+        for worker in workers:
+            worker.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+        self.channels.clear()
@@ -0,0 +1,142 @@
+import asyncio
+import heapq
+import itertools
+import time
+
+DEFAULT_WORKERS = 4  # Deferred stage jobs run at once
+DEFAULT_MAX_QUEUE = 1000  # Deferred jobs waiting before new ones are dropped
+
+
+class MessageInfo:
+    # What the pre-filter worked out about a message, so later stages don't
+    # re-check it
+    __slots__ = ('message', 'mentions_froggy', 'is_command')
+
+    def __init__(self, message, mentions_froggy=False, is_command=False):
+        self.message = message
+        self.mentions_froggy = mentions_froggy
+        self.is_command = is_command
+
+
+class PriorityWorkers:
+    # A fixed pool of worker tasks sharing one heap, lowest priority number
+    # first and FIFO within a priority. Jobs are coroutine functions.
+    def __init__(self, workers=DEFAULT_WORKERS, max_queue=DEFAULT_MAX_QUEUE):
+        self.workers = workers
+        self.max_queue = max_queue
+        self._heap = []
+        self._order = itertools.count()
+        self._ready = None
+        self._tasks = []
+        self.active = 0
+        self.dropped = 0
+        self.failed = 0
+
+    def pending(self):
+        return len(self._heap)
+
+    def submit(self, priority, fn, *args):
+        # Returns False when the queue is full
+        if len(self._heap) >= self.max_queue:
+            self.dropped += 1
+            return False
+        if not self._tasks:
+            self._ready = asyncio.Event()
+            self._tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+        heapq.heappush(self._heap, (priority, next(self._order), fn, args))
+        self._ready.set()
+        return True
+
+    async def _work(self):
+        while True:
+            while not self._heap:
+                self._ready.clear()
+                await self._ready.wait()
+            _, _, fn, args = heapq.heappop(self._heap)
+            self.active += 1
+            try:
+                await fn(*args)
+            except Exception as e:
+                self.failed += 1
+                print(f"Error in {getattr(fn, '__name__', 'background job')}: {str(e)}")
+            finally:
+                self.active -= 1
+
+    def close(self):
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+        self._heap.clear()
+
+
+class _Stage:
+    __slots__ = ('name', 'fn', 'when', 'priority', 'observe')
+
+
+class MessagePipeline:
+    # Runs each message through classify() once, then through the stages in
+    # order. classify returns a MessageInfo, or None for traffic that needs
+    # nothing at all. Inline stages are plain functions of the info and stop
+    # the pipeline by returning True; stages with a priority are coroutine
+    # functions handed to the worker pool. `timer(name)` returns an
+    # observe(seconds) function for each stage, so timings cost one call.
+    def __init__(self, classify, workers=None, timer=None):
+        self.classify = classify
+        self.workers = workers or PriorityWorkers()
+        self.timer = timer
+        self.stages = []
+        self._observe_classify = timer('classify') if timer else None
+        self.handled = 0
+        self.skipped = 0
+
+    def stage(self, name, fn, when=None, priority=None):
+        stage = _Stage()
+        stage.name = name
+        stage.fn = fn
+        stage.when = when
+        stage.priority = priority
+        stage.observe = self.timer(name) if self.timer else None
+        self.stages.append(stage)
+        return fn
+
+    def handle(self, message):
+        started = time.perf_counter()
+        info = self.classify(message)
+        if self._observe_classify:
+            self._observe_classify(time.perf_counter() - started)
+        if info is None:
+            self.skipped += 1
+            return
+        self.handled += 1
+        for stage in self.stages:
+            if stage.when is not None and not stage.when(info):
+                continue
+            if stage.priority is not None:
+                self.workers.submit(stage.priority, self._run_deferred, stage, info)
+                continue
+            started = time.perf_counter()
+            stop = stage.fn(info)
+            if stage.observe:
+                stage.observe(time.perf_counter() - started)
+            if stop:
+                return
+
+    async def _run_deferred(self, stage, info):
+        started = time.perf_counter()
+        try:
+            await stage.fn(info)
+        finally:
+            if stage.observe:
+                stage.observe(time.perf_counter() - started)
+
+    def stats(self):
+        return {
+            'handled': self.handled,
+            'skipped': self.skipped,
+            'deferred_pending': self.workers.pending(),
+            'deferred_dropped': self.workers.dropped,
+            'deferred_failed': self.workers.failed
+        }
+
+    def close(self):
+        self.workers.close()
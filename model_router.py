@@ -0,0 +1,340 @@
+import asyncio
+import time
+from collections import deque
+
+FAST = 'fast'
+STRONG = 'strong'
+
+# Routing defaults
+DEFAULT_LONG_WORDS = 30  # Messages this long go to the strong model
+DEFAULT_HEDGE_AFTER = 4.0  # Seconds a strong call gets before a fast one is raced against it
+DEFAULT_FAILURE_THRESHOLD = 5  # Failures in a row that open a model's circuit
+DEFAULT_RESET_AFTER = 30  # Seconds an open circuit waits before letting a trial call through
+DEFAULT_MAX_DECISIONS = 500  # Recent routing decisions kept for stats()
+
+# Words that usually mean the friend wants more than small talk
+COMPLEX_HINTS = (
+    'explain', 'why ', 'how do', 'how does', 'how can', 'how would', 'help me', 'advice',
+    'should i', 'what if', 'compare', 'difference', 'story', 'write', 'code', 'solve',
+    'puzzle', 'riddle', 'think about', 'opinion'
+)
+
+
+class CircuitOpen(RuntimeError):
+    pass
+
+
+class Throttled(RuntimeError):
+    # admit() refused the call, so no model was asked
+    pass
+
+
+class CircuitBreaker:
+    # Stops calling a model after `threshold` failures in a row. Once
+    # `reset_after` seconds pass, one trial call is let through; success closes
+    # the circuit again and failure keeps it open for another round.
+    def __init__(self, threshold=DEFAULT_FAILURE_THRESHOLD, reset_after=DEFAULT_RESET_AFTER):
+        self.threshold = threshold
+        self.reset_after = reset_after
+        self.failures = 0
+        self.opened_at = None
+        self._trial = False
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return 'closed'
+        if time.time() - self.opened_at >= self.reset_after:
+            return 'half_open'
+        return 'open'
+
+    def allow(self):
+        if self.opened_at is None:
+            return True
+        if not self._trial and time.time() - self.opened_at >= self.reset_after:
+            self._trial = True
+            return True
+        return False
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self._trial = False
+
+    def record_failure(self):
+        self.failures += 1
+        self._trial = False
+        if self.failures >= self.threshold:
+            self.opened_at = time.time()
+
+    def record_cancelled(self):
+        # A hedge loser neither passed nor failed; let the next call be the trial
+        self._trial = False
+
+
+def classify(text, group=False, long_words=DEFAULT_LONG_WORDS):
+    # Cheap guess at how much thought a turn needs: (tier, reason)
+    if group:
+        return STRONG, 'group'
+    words = len(text.split())
+    if words >= long_words:
+        return STRONG, 'long'
+    if '```' in text:
+        return STRONG, 'code'
+    if text.count('?') >= 2:
+        return STRONG, 'questions'
+    lowered = text.lower()
+    if words >= 5 and any(hint in lowered for hint in COMPLEX_HINTS):
+        return STRONG, 'complex'
+    return FAST, 'short' if words < 5 else 'casual'
+
+
+class _Route:
+    def __init__(self, tier, client):
+        self.tier = tier
+        self.client = client
+        self.breaker = None
+
+
+class ModelRouter:
+    # Sends each Gemini call to a fast or strong model. Strong calls that run
+    # past hedge_after get a fast call raced against them and the first answer
+    # wins; a model that fails (or whose circuit is open) falls back to the
+    # other. Every call is recorded with observer(tier, reason, model, seconds,
+    # outcome) and kept in `decisions` for tuning the thresholds.
+    # admit() is asked before every model call, hedges and fallbacks included,
+    # and returns False to refuse it (e.g. a shared quota is used up);
+    # on_error(exception) hears about every failed model call.
+    def __init__(self, fast, strong, hedge_after=DEFAULT_HEDGE_AFTER, long_words=DEFAULT_LONG_WORDS,
+                 failure_threshold=DEFAULT_FAILURE_THRESHOLD, reset_after=DEFAULT_RESET_AFTER,
+                 observer=None, max_decisions=DEFAULT_MAX_DECISIONS, admit=None, on_error=None):
+        self.hedge_after = hedge_after
+        self.long_words = long_words
+        self.observer = observer
+        self.admit = admit
+        self.on_error = on_error
+        self.routes = {FAST: _Route(FAST, fast), STRONG: _Route(STRONG, strong)}
+        for route in self.routes.values():
+            route.breaker = CircuitBreaker(failure_threshold, reset_after)
+        self.decisions = deque(maxlen=max_decisions)
+
+    @property
+    def fast(self):
+        return self.routes[FAST].client
+
+    @property
+    def strong(self):
+        return self.routes[STRONG].client
+
+    @property
+    def in_flight(self):
+        return sum(route.client.in_flight for route in self.routes.values())
+
+    def choose(self, text, group=False):
+        return classify(text, group, self.long_words)
+
+    def breaker_state(self, tier):
+        return self.routes[tier].breaker.state
+
+    def _order(self, tier):
+        return [self.routes[tier], self.routes[STRONG if tier == FAST else FAST]]
+
+    def _next_allowed(self, candidates):
+        while candidates:
+            route = candidates.pop(0)
+            if route.breaker.allow():
+                return route
+        return None
+
+    def _admitted(self, route):
+        if route is None or self.admit is None or self.admit():
+            return route
+        # Nothing was called, so this doesn't count as the breaker's trial
+        route.breaker.record_cancelled()
+        return None
+
+    def _first(self, tier, reason, started, candidates):
+        route = self._next_allowed(candidates)
+        if route is None:
+            self._record(tier, reason, None, started, 'circuit_open')
+            raise CircuitOpen("Every model's circuit is open")
+        if self._admitted(route) is None:
+            self._record(tier, reason, None, started, 'throttled')
+            raise Throttled("Model call refused")
+        return route
+
+    def _failed(self, route, error):
+        route.breaker.record_failure()
+        if self.on_error is not None:
+            try:
+                self.on_error(error)
+            except Exception as e:
+                print(f"Error handling model failure: {str(e)}")
+
+    def _hedge_timeout(self, running, candidates):
+        # Only a slow strong call is worth racing, and only against the fast model
+        if self.hedge_after and len(running) == 1 and candidates:
+            route = next(iter(running.values()))
+            if route.tier == STRONG and candidates[0].tier == FAST:
+                return self.hedge_after
+        return None
+
+    async def generate(self, prompt, tier=FAST, reason='', **kwargs):
+        started = time.perf_counter()
+        candidates = self._order(tier)
+        running = {}  # task -> route
+        hedged = fell_back = False
+        error = None
+
+        def launch(route):
+            running[asyncio.ensure_future(route.client.generate(prompt, **kwargs))] = route
+
+        first = self._first(tier, reason, started, candidates)
+        fell_back = first.tier != tier
+        launch(first)
+        try:
+            while running:
+                done, _ = await asyncio.wait(
+                    running, timeout=self._hedge_timeout(running, candidates),
+                    return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    backup = self._admitted(self._next_allowed(candidates))
+                    if backup is not None:
+                        hedged = True
+                        launch(backup)
+                    continue
+                for task in done:
+                    route = running.pop(task)
+                    if task.exception() is None:
+                        route.breaker.record_success()
+                        outcome = 'hedged' if hedged else 'fallback' if fell_back else 'ok'
+                        self._record(tier, reason, route, started, outcome)
+                        return task.result()
+                    error = task.exception()
+                    self._failed(route, error)
+                if not running:
+                    backup = self._admitted(self._next_allowed(candidates))
+                    if backup is not None:
+                        fell_back = True
+                        launch(backup)
+        finally:
+            await self._cancel(running)
+        self._record(tier, reason, None, started, 'error')
+        raise error or CircuitOpen("Every model's circuit is open")
+
+    async def stream(self, prompt, tier=FAST, reason='', **kwargs):
+        # Same routing as generate(), decided on the first chunk: whichever
+        # model produces text first keeps streaming and the other is dropped
+        started = time.perf_counter()
+        candidates = self._order(tier)
+        running = {}  # first-chunk task -> (route, stream)
+        hedged = fell_back = False
+        error = None
+        winner = None
+
+        def launch(route):
+            chunks = route.client.stream(prompt, **kwargs)
+            running[asyncio.ensure_future(chunks.__anext__())] = (route, chunks)
+
+        first = self._first(tier, reason, started, candidates)
+        fell_back = first.tier != tier
+        launch(first)
+        try:
+            while running and winner is None:
+                hedge_routes = {task: route for task, (route, _) in running.items()}
+                done, _ = await asyncio.wait(
+                    running, timeout=self._hedge_timeout(hedge_routes, candidates),
+                    return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    backup = self._admitted(self._next_allowed(candidates))
+                    if backup is not None:
+                        hedged = True
+                        launch(backup)
+                    continue
+                for task in done:
+                    route, chunks = running.pop(task)
+                    failure = task.exception()
+                    if winner is None and (failure is None or isinstance(failure, StopAsyncIteration)):
+                        winner = (route, chunks, None if failure else task.result())
+                    elif failure is None or isinstance(failure, StopAsyncIteration):
+                        route.breaker.record_success()
+                        await chunks.aclose()
+                    else:
+                        error = failure
+                        self._failed(route, error)
+                if winner is None and not running:
+                    backup = self._admitted(self._next_allowed(candidates))
+                    if backup is not None:
+                        fell_back = True
+                        launch(backup)
+        finally:
+            await self._cancel({task: route for task, (route, _) in running.items()})
+            for _, chunks in running.values():
+                await chunks.aclose()
+
+        if winner is None:
+            self._record(tier, reason, None, started, 'error')
+            raise error or CircuitOpen("Every model's circuit is open")
+
+        route, chunks, text = winner
+        outcome = 'hedged' if hedged else 'fallback' if fell_back else 'ok'
+        try:
+            if text is not None:
+                yield text
+                async for text in chunks:
+                    yield text
+        except Exception as e:
+            self._failed(route, e)
+            self._record(tier, reason, route, started, 'interrupted')
+            raise
+        finally:
+            await chunks.aclose()
+        route.breaker.record_success()
+        self._record(tier, reason, route, started, outcome)
+
+    async def _cancel(self, running):
+        for task, route in running.items():
+            task.cancel()
+            route.breaker.record_cancelled()
+        if running:
+            await asyncio.gather(*running, return_exceptions=True)
+
+    def _record(self, tier, reason, route, started, outcome):
+        seconds = time.perf_counter() - started
+        served_by = route.tier if route else None
+        self.decisions.append((time.time(), tier, reason, served_by, seconds, outcome))
+        if self.observer is not None:
+            try:
+                self.observer(tier, reason, served_by, seconds, outcome)
+            except Exception as e:
+                print(f"Error recording model routing: {str(e)}")
+
+    def stats(self):
+        # Summary of recent decisions: calls per requested tier and reason, and
+        # how each model has been answering
+        routed = {}
+        served = {}
+        for _, tier, reason, served_by, seconds, outcome in self.decisions:
+            key = f"{tier}/{reason}"
+            routed[key] = routed.get(key, 0) + 1
+            if served_by is not None:
+                entry = served.setdefault(served_by, {'calls': 0, 'seconds': 0.0, 'outcomes': {}})
+                entry['calls'] += 1
+                entry['seconds'] += seconds
+                entry['outcomes'][outcome] = entry['outcomes'].get(outcome, 0) + 1
+        for entry in served.values():
+            entry['avg_seconds'] = round(entry.pop('seconds') / entry['calls'], 3)
+        return {
+            'routed': routed,
+            'served': served,
+            'circuits': {tier: route.breaker.state for tier, route in self.routes.items()}
+        }
+
+    async def warm(self):
+        await asyncio.gather(*(route.client.warm() for route in self.routes.values()))
+
+    def close(self):
+        for route in self.routes.values():
+            route.client.close()
@@ -0,0 +1,198 @@
+import asyncio
+import os
+import re
+import unicodedata
+
+# Common character swaps used to dodge filters. Digits are always swapped.
+# Symbols double as punctuation ("stupid!"), so they're only swapped when
+# they sit between letters ("sh!t"), otherwise they stay word boundaries.
+LEET_MAP = str.maketrans({
+    '0': 'o', '1': 'i', '3': 'e', '4': 'a', '5': 's', '7': 't', '8': 'b',
+})
+LEET_SYMBOLS = {'@': 'a', '$': 's', '!': 'i', '|': 'l', '+': 't'}
+_INNER_SYMBOL = re.compile(r'(?<=[^\W_])[@$!|+](?=[^\W_])')
+
+
+def normalize(text):
+    # Fold case, strip accents and undo leetspeak so "STÜP1D" reads as "stupid"
+    if not text.isascii():
+        text = unicodedata.normalize('NFKD', text)
+        text = ''.join(ch for ch in text if not unicodedata.combining(ch))
+    text = text.casefold().translate(LEET_MAP)
+    text = _INNER_SYMBOL.sub(lambda m: LEET_SYMBOLS[m.group()], text)
+    return ' '.join(text.split())
+
+
+class WordFilter:
+    # Aho-Corasick automaton over a word list. Matching is one pass over the
+    # message no matter how many words are listed. Words match whole words
+    # only; a leading or trailing "*" lets that side run into other letters
+    # (e.g. "*word*" also matches inside longer words).
+    def __init__(self, words=()):
+        self.words = []
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [()]
+        for word in words:
+            self._add(word)
+        self._build()
+
+    def __len__(self):
+        return len(self.words)
+
+    def _add(self, word):
+        word = word.strip()
+        left = not word.startswith('*')
+        right = not word.endswith('*')
+        pattern = normalize(word.strip('*'))
+        if not pattern:
+            return
+        self.words.append(word)
+        state = 0
+        for ch in pattern:
+            nxt = self._goto[state].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[state][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append(())
+            state = nxt
+        self._out[state] += ((len(pattern), left, right, word),)
+
+    def _build(self):
+        # Breadth-first pass to wire failure links and merge outputs
+        queue = list(self._goto[0].values())
+        for state in queue:
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fail = self._fail[state]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                target = self._goto[fail].get(ch, 0)
+                self._fail[nxt] = target if target != nxt else 0
+                self._out[nxt] += self._out[self._fail[nxt]]
+
+    def find(self, text):
+        # Returns the first listed word found in text, or None
+        if not self.words:
+            return None
+        return self.find_normalized(normalize(text))
+
+    def find_normalized(self, text):
+        # find() for text that has already been through normalize()
+        if not self.words:
+            return None
+        goto, fail, out = self._goto, self._fail, self._out
+        end = len(text)
+        state = 0
+        for i, ch in enumerate(text):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if out[state]:
+                for length, left, right, word in out[state]:
+                    start = i - length + 1
+                    if left and start > 0 and text[start - 1].isalnum():
+                        continue
+                    if right and i + 1 < end and text[i + 1].isalnum():
+                        continue
+                    return word
+        return None
+
+    def contains(self, text):
+        return self.find(text) is not None
+
+
+def load_words(path):
+    # One word per line; blank lines and lines starting with "#" are skipped
+    with open(path, encoding='utf-8') as f:
+        return [line.strip() for line in f if line.strip() and not line.startswith('#')]
+
+
+class ModerationEngine:
+    # One shared filter for the default words (plus the word list file, if
+    # any) and a small filter per guild with just that guild's extra words; a
+    # message is checked against both. Filters are built off to the side and
+    # swapped in whole, so lists can change without a restart. The async
+    # methods build in an executor, so a big word list never stalls the loop.
+    # The word list file is first read by load(), not on construction.
+    def __init__(self, default_words=(), path=None):
+        self.default_words = list(default_words)
+        self.path = path
+        self._mtime = None
+        self._default = WordFilter(self.default_words)
+        self._guild_words = {}
+        self._guilds = {}
+
+    def load(self):
+        # Reads the word list file now, if there is one; for startup, before
+        # there's an event loop to keep responsive
+        if self.path:
+            try:
+                self._swap_default(*self._read_file())
+            except OSError as e:
+                print(f"Couldn't read bad word list {self.path}: {str(e)}")
+
+    def set_guild_words(self, guild_id, words):
+        # Extra words for one guild on top of the defaults; empty/None clears them
+        words = list(words or ())
+        self._guild_words[guild_id] = words
+        self._swap_guild(guild_id, words, WordFilter(words) if words else None)
+
+    async def update_guild_words(self, guild_id, words):
+        # set_guild_words(), with the filter built in an executor
+        words = list(words or ())
+        self._guild_words[guild_id] = words
+        built = await asyncio.get_running_loop().run_in_executor(None, WordFilter, words) if words else None
+        self._swap_guild(guild_id, words, built)
+
+    def _swap_guild(self, guild_id, words, built):
+        # A newer update may have landed while this one was building
+        if self._guild_words.get(guild_id) is not words:
+            return
+        if built is None:
+            self._guild_words.pop(guild_id, None)
+            self._guilds.pop(guild_id, None)
+        else:
+            self._guilds[guild_id] = built
+
+    def find(self, text, guild_id=None):
+        text = normalize(text)
+        found = self._default.find_normalized(text)
+        if found is None and guild_id is not None:
+            extra = self._guilds.get(guild_id)
+            if extra is not None:
+                found = extra.find_normalized(text)
+        return found
+
+    def contains(self, text, guild_id=None):
+        return self.find(text, guild_id) is not None
+
+    def _changed(self):
+        if not self.path:
+            return False
+        try:
+            return os.path.getmtime(self.path) != self._mtime
+        except OSError:
+            return False
+
+    def _read_file(self):
+        mtime = os.path.getmtime(self.path)
+        return mtime, WordFilter(self.default_words + load_words(self.path))
+
+    def _swap_default(self, mtime, built):
+        self._default = built
+        self._mtime = mtime
+
+    async def reload_if_changed(self):
+        # Picks up edits to the word list file; returns True if it reloaded.
+        # Only the shared filter is rebuilt; guild filters don't include the file
+        if not self._changed():
+            return False
+        try:
+            mtime, built = await asyncio.get_running_loop().run_in_executor(None, self._read_file)
+        except OSError:
+            return False
+        self._swap_default(mtime, built)
+        return True
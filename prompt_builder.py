@@ -0,0 +1,135 @@
+import asyncio
+from collections import OrderedDict
+
+DEFAULT_TOKEN_BUDGET = 800  # Estimated tokens of history sent with each prompt
+DEFAULT_MAX_CACHED = 20000  # Conversations with rendered history kept around
+
+
+def estimate_tokens(text):
+    # Gemini averages about 4 characters per token for English chat
+    return len(text) // 4 + 1
+
+
+class _Rendered:
+    def __init__(self):
+        self.last_time = None
+        self.lines = []  # (time, line, tokens) for each message, oldest first
+
+
+class PromptBuilder:
+    # Turns a conversation into prompt text. Each message is rendered once and
+    # reused until it leaves the history; history is trimmed newest-first to a
+    # token budget, and whatever gets trimmed is summarized once in the
+    # background so it isn't simply forgotten.
+    def __init__(self, persona, token_budget=DEFAULT_TOKEN_BUDGET, summarize=None,
+                 persona_in_system=False, max_cached=DEFAULT_MAX_CACHED):
+        self.token_budget = token_budget
+        self.summarize = summarize
+        self.max_cached = max_cached
+        # When the model carries the persona as a system instruction, there's
+        # no need to send it with every prompt
+        self.persona_prefix = "" if persona_in_system else f"{persona}\n\n"
+        self._rendered = OrderedDict()
+        self._summaries = OrderedDict()  # key -> (time of last summarized message, summary)
+        self._summarizing = {}
+
+    def context(self, key, history, max_messages=None):
+        if not history:
+            return "This is the start of the conversation."
+
+        lines = self._render(key, history)
+        if max_messages is not None and len(lines) > max_messages:
+            lines = lines[-max_messages:]
+        kept = []
+        used = 0
+        summary = self._summaries.get(key)
+        if summary:
+            used += estimate_tokens(summary[1])
+        for msg_time, line, tokens in reversed(lines):
+            if kept and used + tokens > self.token_budget:
+                break
+            kept.append(line)
+            used += tokens
+
+        dropped = len(lines) - len(kept)
+        if dropped:
+            self._schedule_summary(key, lines[:dropped])
+
+        context = "Recent conversation history:\n"
+        if summary and dropped:
+            context += f"(Earlier: {summary[1]})\n"
+        context += "".join(reversed(kept))
+        return context
+
+    def build(self, key, history, message_content, max_messages=None):
+        return f"{self.persona_prefix}{self.context(key, history, max_messages)}\n\nFriend: {message_content}\nFroggy:"
+
+    def pending_summaries(self):
+        return len(self._summarizing)
+
+    async def close(self):
+        # Cancels summaries still being written; what's trimmed is simply not summarized
+        tasks = list(self._summarizing.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def export_state(self):
+        # Summaries of trimmed history are the one thing here that can't be
+        # rebuilt from stored conversations: (channel_id, user_id, upto, summary)
+        return [(key[0], key[1], upto, summary) for key, (upto, summary) in self._summaries.items()]
+
+    def import_state(self, entries):
+        for channel_id, user_id, upto, summary in entries:
+            self._summaries[(channel_id, user_id)] = (upto, summary)
+
+    def _render(self, key, history):
+        rendered = self._rendered.get(key)
+        if rendered is None:
+            rendered = self._rendered[key] = _Rendered()
+            while len(self._rendered) > self.max_cached:
+                evicted, _ = self._rendered.popitem(last=False)
+                self._summaries.pop(evicted, None)
+        else:
+            self._rendered.move_to_end(key)
+
+        newest = history[-1]['time']
+        if rendered.last_time != newest:
+            # Only render messages newer than what's already cached
+            last_time = rendered.last_time or 0
+            for msg in history:
+                if msg['time'] > last_time:
+                    speaker = "Froggy" if msg['is_froggy'] else "Friend"
+                    line = f"{speaker}: {msg['content']}\n"
+                    rendered.lines.append((msg['time'], line, estimate_tokens(line)))
+            # Forget lines that have scrolled out of the stored history
+            oldest = history[0]['time']
+            while rendered.lines and rendered.lines[0][0] < oldest:
+                rendered.lines.pop(0)
+            rendered.last_time = newest
+        return rendered.lines
+
+    def _schedule_summary(self, key, dropped_lines):
+        if self.summarize is None or key in self._summarizing:
+            return
+        upto = dropped_lines[-1][0]
+        summary = self._summaries.get(key)
+        if summary and summary[0] >= upto:
+            return
+        previous = summary[1] if summary else ""
+        # Lines the previous summary already covers only go in as that summary
+        covered = summary[0] if summary else float('-inf')
+        text = "".join(line for msg_time, line, _ in dropped_lines if msg_time > covered)
+        self._summarizing[key] = asyncio.create_task(self._summarize(key, upto, previous, text))
+
+    async def _summarize(self, key, upto, previous, text):
+        try:
+            summary = await self.summarize(previous, text)
+            if summary:
+                self._summaries[key] = (upto, summary.strip())
+                while len(self._summaries) > self.max_cached:
+                    self._summaries.popitem(last=False)
+        except Exception as e:
+            print(f"Error summarizing conversation: {str(e)}")
+        finally:
+            self._summarizing.pop(key, None)
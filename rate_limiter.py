@@ -0,0 +1,153 @@
+import time
+
+# Default limits as (replies, per seconds)
+DEFAULT_USER_LIMIT = (6, 60)
+DEFAULT_CHANNEL_LIMIT = (20, 60)
+DEFAULT_GUILD_LIMIT = (60, 60)
+DEFAULT_GLOBAL_LIMIT = (300, 60)  # Keep under the Gemini project quota
+DEFAULT_MAX_KEYS = 200000  # Buckets held per scope before an early sweep
+
+SCOPES = ('user', 'channel', 'guild', 'global')
+
+
+class TokenBuckets:
+    # One token bucket per key, stored as a single float: the time the bucket
+    # will be full again (GCRA). A key whose time has passed is a full bucket,
+    # so it can be dropped without changing any answer, which keeps memory to
+    # the keys that were active in the last `per` seconds.
+    def __init__(self, rate, per, burst=None, max_keys=DEFAULT_MAX_KEYS):
+        self.interval = per / rate
+        self.burst = rate if burst is None else burst
+        self.max_keys = max_keys
+        self._sweep_at = max_keys
+        self._full_at = {}
+
+    def __len__(self):
+        return len(self._full_at)
+
+    def allowed(self, key, now):
+        full_at = self._full_at.get(key, now)
+        return full_at - now <= (self.burst - 1) * self.interval
+
+    def take(self, key, now):
+        full_at = self._full_at.get(key, now)
+        self._full_at[key] = max(full_at, now) + self.interval
+        if len(self._full_at) > self._sweep_at:
+            self.sweep(now)
+
+    def retry_after(self, key, now):
+        full_at = self._full_at.get(key, now)
+        return max(0.0, full_at - now - (self.burst - 1) * self.interval)
+
+    def export_state(self):
+        # (key, wall-clock time the bucket is full again) for buckets that
+        # aren't full; the monotonic clock doesn't survive a restart
+        now = time.monotonic()
+        offset = time.time() - now
+        return [(key, full_at + offset) for key, full_at in self._full_at.items() if full_at > now]
+
+    def import_state(self, entries):
+        offset = time.monotonic() - time.time()
+        for key, full_at in entries:
+            self._full_at[key] = full_at + offset
+
+    def sweep(self, now):
+        # Rebuilding also compacts the dict after a burst of one-off users
+        self._full_at = {key: full_at for key, full_at in self._full_at.items() if full_at > now}
+        # If everything is still active, wait for the table to double before
+        # sweeping again so takes stay O(1) on average
+        self._sweep_at = max(self.max_keys, 2 * len(self._full_at))
+        return len(self._full_at)
+
+
+class RateLimiter:
+    # Token buckets per user, per channel and per guild, plus one global bucket
+    # that governs the total Gemini call rate. blocked() is the cheap check
+    # made when a mention arrives; take() charges the user, channel and guild
+    # only once a reply is really generated (a cached reply costs nothing), and
+    # take_global() is charged once per Gemini call by the model router.
+    def __init__(self, user=DEFAULT_USER_LIMIT, channel=DEFAULT_CHANNEL_LIMIT, guild=DEFAULT_GUILD_LIMIT,
+                 global_limit=DEFAULT_GLOBAL_LIMIT, max_keys=DEFAULT_MAX_KEYS):
+        self.buckets = {
+            'user': TokenBuckets(*user, max_keys=max_keys),
+            'channel': TokenBuckets(*channel, max_keys=max_keys),
+            'guild': TokenBuckets(*guild, max_keys=max_keys),
+            'global': TokenBuckets(*global_limit)
+        }
+        self.paused_until = 0.0
+        self.throttled = dict.fromkeys(SCOPES, 0)
+
+    def blocked(self, user_id, channel_id, guild_id=None):
+        # Returns None when the request may go ahead, otherwise the scope that's
+        # out of tokens. Takes nothing, so a throttled request costs nothing
+        now = time.monotonic()
+        for scope, key in self._keys(user_id, channel_id, guild_id):
+            if not self.buckets[scope].allowed(key, now):
+                self.throttled[scope] += 1
+                return scope
+        if not self.global_allowed(now):
+            self.throttled['global'] += 1
+            return 'global'
+        return None
+
+    def take(self, user_id, channel_id, guild_id=None):
+        # Charges one reply to the user, channel and guild. It isn't refused:
+        # a burst that got past blocked() runs the buckets into debt, which
+        # holds back the requests that come after it
+        now = time.monotonic()
+        for scope, key in self._keys(user_id, channel_id, guild_id):
+            self.buckets[scope].take(key, now)
+
+    def global_allowed(self, now=None):
+        now = time.monotonic() if now is None else now
+        return now >= self.paused_until and self.buckets['global'].allowed(None, now)
+
+    def take_global(self):
+        # Charged for every Gemini call; False means don't make the call
+        now = time.monotonic()
+        if not self.global_allowed(now):
+            self.throttled['global'] += 1
+            return False
+        self.buckets['global'].take(None, now)
+        return True
+
+    @staticmethod
+    def _keys(user_id, channel_id, guild_id):
+        keys = [('user', user_id), ('channel', channel_id)]
+        if guild_id is not None:
+            keys.append(('guild', guild_id))
+        return keys
+
+    def backoff(self, seconds):
+        # Gemini said the quota is used up; stop calling it for a while
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    def retry_after(self, scope, key):
+        now = time.monotonic()
+        wait = self.buckets[scope].retry_after(key, now)
+        if scope == 'global':
+            wait = max(wait, self.paused_until - now)
+        return wait
+
+    def export_state(self):
+        # {scope: [(key, full_at)]}; the global bucket's key is stored as 0
+        return {
+            scope: [(key or 0, full_at) for key, full_at in buckets.export_state()]
+            for scope, buckets in self.buckets.items()
+        }
+
+    def import_state(self, state):
+        for scope, entries in state.items():
+            if scope == 'global':
+                entries = [(None, full_at) for _, full_at in entries]
+            self.buckets[scope].import_state(entries)
+
+    def sweep(self):
+        now = time.monotonic()
+        return sum(buckets.sweep(now) for buckets in self.buckets.values())
+
+    def stats(self):
+        return {
+            'buckets': {scope: len(buckets) for scope, buckets in self.buckets.items()},
+            'throttled': dict(self.throttled)
+        }
@@ -0,0 +1,177 @@
+import hashlib
+import importlib.util
+import re
+import time
+from collections import OrderedDict
+
+# The similarity layer is optional and off unless an embedding function is
+# given. numpy is imported the first time it's used, so importing the bot
+# doesn't wait for it
+HAVE_NUMPY = importlib.util.find_spec("numpy") is not None
+np = None
+
+
+def _load_numpy():
+    global np
+    if np is None:
+        import numpy
+        np = numpy
+    return np
+
+DEFAULT_MAX_ENTRIES = 5000  # Exact-match replies kept
+DEFAULT_MAX_SIMILAR = 2000  # Replies indexed for similarity lookups
+DEFAULT_TTL = 3600  # Seconds a cached reply stays usable
+DEFAULT_SIMILARITY = 0.95  # Cosine similarity needed to reuse a reply
+
+# Openers that don't change what Froggy should say back ("hey froggy" gets the
+# same answer as "hi froggy"), folded together for exact matches
+GREETINGS = {'hi', 'hey', 'hello', 'heya', 'hiya', 'howdy', 'yo', 'hai', 'helo', 'hallo', 'heyy', 'heyyy'}
+
+_MENTION_RE = re.compile(r"<[@#][!&]?\d+>")
+_PUNCT_RE = re.compile(r"[^\w\s]")
+_SPACE_RE = re.compile(r"\s+")
+
+
+def normalize(text):
+    # "Hi Froggy!!", "hi   froggy" and "hey froggy" should land on the same entry
+    text = _MENTION_RE.sub(" ", text.lower())
+    text = _PUNCT_RE.sub("", text)
+    text = _SPACE_RE.sub(" ", text).strip()
+    first, _, rest = text.partition(" ")
+    if first in GREETINGS:
+        text = f"hi {rest}" if rest else "hi"
+    return text
+
+
+def _context_hash(context):
+    return int.from_bytes(hashlib.blake2b(context.encode(), digest_size=8).digest(), "big", signed=True)
+
+
+class _SimilarityIndex:
+    # Fixed-size ring of L2-normalized embeddings searched with a single matrix product
+    def __init__(self, capacity, dim):
+        _load_numpy()
+        self.capacity = capacity
+        self.vectors = np.zeros((capacity, dim), dtype=np.float32)
+        self.contexts = np.zeros(capacity, dtype=np.int64)
+        self.times = np.full(capacity, -np.inf)
+        self.responses = [None] * capacity
+        self._next = 0
+
+    def add(self, vector, context_hash, response, now):
+        i = self._next
+        self.vectors[i] = vector
+        self.contexts[i] = context_hash
+        self.times[i] = now
+        self.responses[i] = response
+        self._next = (i + 1) % self.capacity
+
+    def search(self, vector, context_hash, cutoff, threshold):
+        scores = self.vectors @ vector
+        scores[(self.contexts != context_hash) | (self.times < cutoff)] = -1.0
+        best = int(np.argmax(scores))
+        if scores[best] >= threshold:
+            return self.responses[best]
+        return None
+
+    def clear(self):
+        self.times[:] = -np.inf
+        self.responses = [None] * self.capacity
+
+
+class ResponseCache:
+    # Two layers in front of Gemini: an exact LRU keyed on the normalized
+    # message plus its trimmed context, then, when `embed` is given and numpy
+    # is available, a nearest-neighbour search over embeddings of past
+    # messages with the same context. `embed(text)` must return a vector from
+    # a real sentence embedding model; surface-level similarity (shared
+    # characters or words) can't tell "happy" from "not happy" and would hand
+    # one user's reply to a different question.
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, ttl=DEFAULT_TTL, embed=None,
+                 max_similar=DEFAULT_MAX_SIMILAR, threshold=DEFAULT_SIMILARITY):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.threshold = threshold
+        self._entries = OrderedDict()
+        self.embed = embed
+        self.similarity = embed is not None and HAVE_NUMPY
+        self.max_similar = max_similar
+        self._index = None
+        self.hits = 0
+        self.similar_hits = 0
+        self.misses = 0
+        self.saved_seconds = 0.0
+        self._avg_latency = 0.0
+
+    def get(self, message, context=""):
+        now = time.time()
+        text = normalize(message)
+        context_hash = _context_hash(context)
+        key = (text, context_hash)
+        entry = self._entries.get(key)
+        if entry is not None:
+            if now - entry[0] <= self.ttl:
+                self._entries.move_to_end(key)
+                self._hit()
+                return entry[1]
+            del self._entries[key]
+        if self.similarity and text and self._index is not None:
+            response = self._index.search(self._embed(text), context_hash, now - self.ttl, self.threshold)
+            if response is not None:
+                self.similar_hits += 1
+                self._hit()
+                return response
+        self.misses += 1
+        return None
+
+    def put(self, message, response, context="", latency=None):
+        now = time.time()
+        text = normalize(message)
+        context_hash = _context_hash(context)
+        self._entries[(text, context_hash)] = (now, response)
+        self._entries.move_to_end((text, context_hash))
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        if self.similarity and text:
+            vector = self._embed(text)
+            self._similarity_index(len(vector)).add(vector, context_hash, response, now)
+        if latency is not None:
+            # Running average of what a miss costs, used to estimate time saved
+            self._avg_latency += (latency - self._avg_latency) * 0.1 if self._avg_latency else latency
+
+    def warm(self):
+        # Load numpy and the embedding model and allocate the index ahead of
+        # the first lookup; safe to run in a worker thread
+        if self.similarity:
+            self._similarity_index(len(self._embed("hi")))
+
+    def _embed(self, text):
+        np = _load_numpy()
+        vector = np.asarray(self.embed(text), dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _similarity_index(self, dim):
+        if self._index is None:
+            self._index = _SimilarityIndex(self.max_similar, dim)
+        return self._index
+
+    def _hit(self):
+        self.hits += 1
+        self.saved_seconds += self._avg_latency
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'similar_hits': self.similar_hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'entries': len(self._entries),
+            'saved_seconds': round(self.saved_seconds, 2)
+        }
+
+    def clear(self):
+        self._entries.clear()
+        if self._index is not None:
+            self._index.clear()
@@ -0,0 +1,181 @@
+import asyncio
+import heapq
+import itertools
+import time
+
+# Priority lanes; lower goes first
+MODERATION = 0
+REPLY = 1
+FUN = 2
+
+DISCORD_MESSAGE_LIMIT = 2000
+DEFAULT_RATE = 5  # Messages per DEFAULT_PER seconds in one channel (Discord's bucket)
+DEFAULT_PER = 5.0
+DEFAULT_REACTION_RATE = 4  # Reactions per second in one channel
+DEFAULT_MAX_QUEUE = 50  # Queued items per channel before FUN items are dropped
+
+
+class _Bucket:
+    def __init__(self, rate, per):
+        self.rate = rate
+        self.per = per
+        self.tokens = float(rate)
+        self.refilled = time.monotonic()
+
+    def delay(self):
+        # Seconds until a token is available (0 if one is ready now, and takes it)
+        now = time.monotonic()
+        self.tokens = min(self.rate, self.tokens + (now - self.refilled) * self.rate / self.per)
+        self.refilled = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) * self.per / self.rate
+
+
+class _Outbound:
+    __slots__ = ('kind', 'target', 'content', 'embed', 'mergeable', 'future')
+
+    def __init__(self, kind, target, content=None, embed=None, mergeable=False):
+        self.kind = kind
+        self.target = target
+        self.content = content
+        self.embed = embed
+        self.mergeable = mergeable
+        self.future = asyncio.get_running_loop().create_future()
+
+
+class _ChannelLane:
+    def __init__(self, rate, per, reaction_rate):
+        self.heap = []
+        self.worker = None
+        self.messages = _Bucket(rate, per)
+        self.edits = _Bucket(rate, per)  # Edits have their own bucket on Discord's side
+        self.reactions = _Bucket(reaction_rate, 1.0)
+
+
+class OutboundDispatcher:
+    # Every message, reply, edit and reaction Froggy sends goes through here. Each
+    # channel gets its own queue, drained in priority order and paced to
+    # Discord's per-channel limits so sends don't run into 429s. Consecutive
+    # small mergeable messages are combined into one. Callers get a future
+    # that resolves to the sent message, or None if sending failed.
+    # `observer(kind, seconds, ok)` is called after every delivery attempt.
+    def __init__(self, rate=DEFAULT_RATE, per=DEFAULT_PER, reaction_rate=DEFAULT_REACTION_RATE,
+                 max_queue=DEFAULT_MAX_QUEUE, observer=None):
+        self.rate = rate
+        self.per = per
+        self.reaction_rate = reaction_rate
+        self.max_queue = max_queue
+        self.observer = observer
+        self._lanes = {}
+        self._seq = itertools.count()
+        self.sent = 0
+        self.merged = 0
+        self.dropped = 0
+        self.failed = 0
+
+    def send(self, channel, content=None, embed=None, priority=REPLY, mergeable=False):
+        item = _Outbound('send', channel, content, embed, mergeable and embed is None)
+        return self._enqueue(channel.id, item, priority)
+
+    def reply(self, message, content, priority=REPLY):
+        return self._enqueue(message.channel.id, _Outbound('reply', message, content), priority)
+
+    def edit(self, message, content, priority=REPLY):
+        # Resolves to the edited message, or None if the edit failed
+        return self._enqueue(message.channel.id, _Outbound('edit', message, content), priority)
+
+    def react(self, message, emoji, priority=FUN):
+        return self._enqueue(message.channel.id, _Outbound('react', message, emoji), priority)
+
+    def pending(self):
+        return sum(len(lane.heap) for lane in self._lanes.values())
+
+    def _enqueue(self, channel_id, item, priority):
+        lane = self._lanes.get(channel_id)
+        if lane is None:
+            lane = self._lanes[channel_id] = _ChannelLane(self.rate, self.per, self.reaction_rate)
+        if priority >= FUN and len(lane.heap) >= self.max_queue:
+            self.dropped += 1
+            item.future.set_result(None)
+            return item.future
+        heapq.heappush(lane.heap, (priority, next(self._seq), item))
+        if lane.worker is None:
+            lane.worker = asyncio.create_task(self._run(channel_id, lane))
+        return item.future
+
+    async def _run(self, channel_id, lane):
+        try:
+            while lane.heap:
+                priority, _, item = heapq.heappop(lane.heap)
+                bucket = lane.reactions if item.kind == 'react' else lane.edits if item.kind == 'edit' else lane.messages
+                wait = bucket.delay()
+                while wait:
+                    await asyncio.sleep(wait)
+                    wait = bucket.delay()
+
+                # Merge after waiting, so whatever queued up meanwhile goes out together
+                futures = [item.future]
+                if item.mergeable:
+                    content = self._merge(lane, priority, item, futures)
+                else:
+                    content = item.content
+
+                result = await self._deliver(item, content)
+                for future in futures:
+                    if not future.done():
+                        future.set_result(result)
+        finally:
+            lane.worker = None
+            if not lane.heap:
+                self._lanes.pop(channel_id, None)
+
+    def _merge(self, lane, priority, item, futures):
+        # Fold following small messages to the same channel into this one
+        content = item.content
+        while lane.heap:
+            next_priority, _, following = lane.heap[0]
+            if next_priority != priority or not following.mergeable:
+                break
+            if len(content) + 1 + len(following.content) > DISCORD_MESSAGE_LIMIT:
+                break
+            heapq.heappop(lane.heap)
+            content = f"{content}\n{following.content}"
+            futures.append(following.future)
+            self.merged += 1
+        return content
+
+    async def _deliver(self, item, content):
+        started = time.perf_counter()
+        ok = False
+        try:
+            if item.kind == 'send':
+                if item.embed is not None:
+                    result = await item.target.send(content, embed=item.embed)
+                else:
+                    result = await item.target.send(content)
+            elif item.kind == 'reply':
+                result = await item.target.reply(content)
+            elif item.kind == 'edit':
+                result = await item.target.edit(content=content)
+            else:
+                await item.target.add_reaction(content)
+                result = item.target
+            self.sent += 1
+            ok = True
+            return result
+        except Exception as e:
+            self.failed += 1
+            print(f"Error sending to Discord: {str(e)}")
+            return None
+        finally:
+            if self.observer is not None:
+                self.observer(item.kind, time.perf_counter() - started, ok)
+
+    async def close(self):
+        workers = [lane.worker for lane in self._lanes.values() if lane.worker]
+        for worker in workers:
+            worker.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+        self._lanes.clear()
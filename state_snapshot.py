@@ -0,0 +1,94 @@
+import os
+import struct
+import time
+import zlib
+
+# Binary snapshot of in-memory state that isn't kept anywhere else, written on
+# shutdown and read back on boot. Layout (little-endian, zlib-compressed):
+#   header:  magic "FRSN", version u16, saved_at f64
+#   section: tag u8, record count u32, then the records
+MAGIC = b"FRSN"
+VERSION = 1
+_HEADER = struct.Struct("<4sHd")
+_SECTION = struct.Struct("<BI")
+
+# tag -> (name, fixed part of each record). A record whose last field is a
+# byte length is followed by that many bytes of UTF-8 text
+SECTIONS = {
+    1: ("idle", struct.Struct("<QQdd")),  # channel_id, user_id, last_activity, cooldown
+    2: ("rate_user", struct.Struct("<Qd")),  # key, full_at
+    3: ("rate_channel", struct.Struct("<Qd")),
+    4: ("rate_guild", struct.Struct("<Qd")),
+    5: ("rate_global", struct.Struct("<Qd")),
+    6: ("throttle_notices", struct.Struct("<Qd")),
+    7: ("summaries", struct.Struct("<QQdI")),  # channel_id, user_id, summarized_up_to, text length
+}
+_TEXT_SECTIONS = {"summaries"}
+_TAGS = {name: (tag, record) for tag, (name, record) in SECTIONS.items()}
+
+
+def encode(sections, saved_at=None):
+    # sections maps a section name to a list of tuples; for text sections the
+    # last item of each tuple is the text instead of its length
+    parts = [_HEADER.pack(MAGIC, VERSION, time.time() if saved_at is None else saved_at)]
+    for name, records in sections.items():
+        tag, record = _TAGS[name]
+        parts.append(_SECTION.pack(tag, len(records)))
+        if name in _TEXT_SECTIONS:
+            for *fields, text in records:
+                data = text.encode()
+                parts.append(record.pack(*fields, len(data)))
+                parts.append(data)
+        else:
+            parts.extend(record.pack(*fields) for fields in records)
+    return zlib.compress(b"".join(parts), 1)
+
+
+def decode(blob):
+    # Returns (saved_at, sections); unknown sections end the read, so a newer
+    # snapshot still loads what this version understands
+    data = zlib.decompress(blob)
+    magic, version, saved_at = _HEADER.unpack_from(data, 0)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("Not a Froggy state snapshot, or from another version")
+    offset = _HEADER.size
+    sections = {}
+    while offset < len(data):
+        tag, count = _SECTION.unpack_from(data, offset)
+        offset += _SECTION.size
+        if tag not in SECTIONS:
+            break
+        name, record = SECTIONS[tag]
+        records = sections[name] = []
+        for _ in range(count):
+            fields = record.unpack_from(data, offset)
+            offset += record.size
+            if name in _TEXT_SECTIONS:
+                length = fields[-1]
+                text = data[offset:offset + length].decode()
+                offset += length
+                fields = fields[:-1] + (text,)
+            records.append(fields)
+    return saved_at, sections
+
+
+def save(path, sections):
+    # Written to a temp file and swapped in, so a crash mid-write keeps the old one
+    blob = encode(sections)
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(blob)
+    os.replace(tmp, path)
+    return len(blob)
+
+
+def load(path):
+    # Returns (saved_at, sections), or (None, {}) when there's nothing usable
+    try:
+        with open(path, "rb") as f:
+            return decode(f.read())
+    except FileNotFoundError:
+        return None, {}
+    except (ValueError, struct.error, zlib.error, UnicodeDecodeError) as e:
+        print(f"Ignoring unreadable state snapshot {path}: {str(e)}")
+        return None, {}
@@ -0,0 +1,87 @@
+import time
+
+DISCORD_MESSAGE_LIMIT = 2000  # Max characters in one Discord message
+EDIT_INTERVAL = 1.2  # Seconds between edits; Discord allows ~5 edits per 5s per channel
+
+
+class StreamingReply:
+    # Shows a reply while it's still being generated: the first chunk is posted
+    # as a reply right away, later chunks are folded in by editing that message,
+    # and anything past the 2000 character limit spills into follow-up messages.
+    # `reply` and `send` post the first and follow-up messages and `edit(sent,
+    # content)` updates one; they default to message.reply, message.channel.send
+    # and sent.edit.
+    def __init__(self, message, edit_interval=EDIT_INTERVAL, limit=DISCORD_MESSAGE_LIMIT, reply=None, send=None,
+                 edit=None):
+        self.message = message
+        self._reply = reply or message.reply
+        self._send = send or message.channel.send
+        self._edit = edit or (lambda sent, content: sent.edit(content=content))
+        self.edit_interval = edit_interval
+        self.limit = limit
+        self.text = ""
+        self.messages = []
+        self.started = time.perf_counter()
+        self.first_token_latency = None
+        self.total_latency = None
+        self._offset = 0  # Where the message currently being edited starts in self.text
+        self._current = None
+        self._shown = ""
+        self._last_edit = 0.0
+
+    async def feed(self, chunk):
+        chunk = chunk.replace('"', '')
+        if not self.text:
+            chunk = chunk.lstrip()
+        if not chunk:
+            return
+        self.text += chunk
+        if self._current is None or time.perf_counter() - self._last_edit >= self.edit_interval:
+            await self._flush()
+
+    async def finish(self):
+        self.text = self.text.rstrip()
+        await self._flush()
+        self.total_latency = time.perf_counter() - self.started
+        return self.text
+
+    async def _flush(self):
+        while True:
+            pending = self.text[self._offset:]
+            if len(pending) <= self.limit:
+                break
+            # Close off the current message at a word boundary and start a new one
+            cut = split_point(pending, self.limit)
+            await self._show(pending[:cut].rstrip())
+            rest = pending[cut:]
+            self._offset += cut + (len(rest) - len(rest.lstrip()))
+            self._current = None
+            self._shown = ""
+        if pending and pending != self._shown:
+            await self._show(pending)
+
+    async def _show(self, content):
+        if not content:
+            return
+        if self._current is None:
+            if self.messages:
+                self._current = await self._send(content)
+            else:
+                self._current = await self._reply(content)
+                self.first_token_latency = time.perf_counter() - self.started
+            if self._current is None:
+                raise RuntimeError("Couldn't post the reply to Discord")
+            self.messages.append(self._current)
+        elif await self._edit(self._current, content) is None:
+            raise RuntimeError("Couldn't update the reply on Discord")
+        self._shown = content
+        self._last_edit = time.perf_counter()
+
+
+def split_point(text, limit):
+    # Prefer breaking on a newline, then a space, otherwise hard cut at the limit
+    for sep in ("\n", " "):
+        cut = text.rfind(sep, 0, limit)
+        if cut > limit // 2:
+            return cut
+    return limit
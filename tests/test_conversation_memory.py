@@ -0,0 +1,78 @@
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from conversation_memory import ConversationMemory, SQLiteBackend
+
+
+def contents(history):
+    return [m['content'] for m in history]
+
+
+def test_evicted_conversations_are_written_on_flush(tmp_path):
+    async def run():
+        memory = ConversationMemory(SQLiteBackend(str(tmp_path / 'memory.db')), max_messages=3, max_conversations=1)
+        memory.append(1, 1, 'a')
+        memory.append(1, 2, 'b')  # Evicts (1, 1) without writing it yet
+        assert memory.backend.load((1, 1)) is None
+        assert await memory.flush() == 2
+        assert contents(memory.backend.load((1, 1))) == ['a']
+        await memory.load(1, 1)
+        assert contents(memory.get(1, 1)) == ['a']
+        await memory.close()
+    asyncio.run(run())
+
+
+def test_stored_history_is_merged_after_restart(tmp_path):
+    path = str(tmp_path / 'memory.db')
+
+    async def run():
+        memory = ConversationMemory(SQLiteBackend(path), max_messages=3)
+        memory.append(1, 1, 'a')
+        memory.append(1, 1, 'b')
+        await memory.close()
+
+        memory = ConversationMemory(SQLiteBackend(path), max_messages=3)
+        memory.append(1, 1, 'c')
+        assert contents(memory.get(1, 1)) == ['c']  # get() never reads the backend
+        await memory.load(1, 1)
+        assert contents(memory.get(1, 1)) == ['a', 'b', 'c']
+        memory.append(1, 1, 'd')
+        await memory.flush()
+        assert contents(memory.backend.load((1, 1))) == ['b', 'c', 'd']
+        await memory.close()
+    asyncio.run(run())
+
+
+def test_flush_merges_without_duplicates(tmp_path):
+    path = str(tmp_path / 'memory.db')
+
+    async def run():
+        memory = ConversationMemory(SQLiteBackend(path), max_messages=5)
+        memory.append(1, 1, 'a')
+        await memory.close()
+
+        memory = ConversationMemory(SQLiteBackend(path), max_messages=5)
+        memory.append(1, 1, 'b')
+        flushing = asyncio.ensure_future(memory.flush())
+        await asyncio.sleep(0)
+        memory.append(1, 1, 'c')  # Lands while the write is in progress
+        await flushing
+        assert contents(memory.get(1, 1)) == ['a', 'b', 'c']
+        await memory.flush()
+        assert contents(memory.backend.load((1, 1))) == ['a', 'b', 'c']
+        await memory.close()
+    asyncio.run(run())
+
+
+def test_expired_conversations_are_forgotten():
+    memory = ConversationMemory(ttl=-1)
+    memory.append(1, 1, 'a')
+    assert memory.get(1, 1) == ()
+    assert len(memory) == 0
+    memory.append(1, 1, 'b')
+    assert (1, 1) in memory._unmerged
+    memory.get(1, 1)
+    assert (1, 1) not in memory._unmerged
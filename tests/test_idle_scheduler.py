@@ -0,0 +1,43 @@
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from idle_scheduler import IdleScheduler
+
+
+def test_close_cancels_follow_ups_and_keeps_their_channels():
+    async def run():
+        started = asyncio.Event()
+
+        async def follow_up(channel_id, user_id):
+            started.set()
+            await asyncio.sleep(60)
+
+        scheduler = IdleScheduler(follow_up, cooldown=0, jitter=0)
+        scheduler.touch(1, 2)
+        runner = asyncio.create_task(scheduler.run())
+        await asyncio.wait_for(started.wait(), 1)
+        assert scheduler.in_flight() == 1
+        assert len(scheduler) == 0
+        await scheduler.close()
+        runner.cancel()
+        assert scheduler.in_flight() == 0
+        assert [entry[:2] for entry in scheduler.export_state()] == [(1, 2)]
+    asyncio.run(run())
+
+
+def test_nothing_fires_while_paused():
+    async def run():
+        fired = []
+
+        async def follow_up(channel_id, user_id):
+            fired.append(channel_id)
+
+        scheduler = IdleScheduler(follow_up, cooldown=0, jitter=0, paused=lambda: True)
+        scheduler.touch(1, 2)
+        scheduler._fire_due()
+        await asyncio.sleep(0)
+        assert fired == [] and len(scheduler) == 1
+    asyncio.run(run())
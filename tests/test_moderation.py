@@ -0,0 +1,102 @@
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from moderation import ModerationEngine, WordFilter, normalize
+
+MEAN_WORDS = WordFilter(['stupid', 'dumb', 'hate', 'bad', 'ugly', 'shut up', 'annoying'])
+
+
+def test_trailing_punctuation_still_matches():
+    assert MEAN_WORDS.find("you are stupid!") == 'stupid'
+    assert MEAN_WORDS.find("shut up!!") == 'shut up'
+    assert MEAN_WORDS.find("ugly?") == 'ugly'
+    assert MEAN_WORDS.find("(dumb)") == 'dumb'
+    assert MEAN_WORDS.find("so annoying|") == 'annoying'
+
+
+def test_bad_words_with_digits_and_punctuation():
+    engine = ModerationEngine(['badword1', 'badword2'])
+    assert engine.find("this is badword1!") == 'badword1'
+    assert engine.find("BADWORD2.") == 'badword2'
+    assert engine.find("badwordi") == 'badword1'
+
+
+def test_leetspeak():
+    assert MEAN_WORDS.find("STÜP1D") == 'stupid'
+    assert MEAN_WORDS.find("h4te") == 'hate'
+    assert MEAN_WORDS.find("5tup!d frog") == 'stupid'
+    assert MEAN_WORDS.find("b@d!") == 'bad'
+    assert MEAN_WORDS.find("ha+e you") == 'hate'
+
+
+def test_symbols_in_word_list_are_normalized_the_same_way():
+    words = WordFilter(['sh!t'])
+    assert words.find("sh!t") == 'sh!t'
+    assert words.find("shit!") == 'sh!t'
+    assert words.find("oh SH1T") == 'sh!t'
+
+
+def test_no_false_positives():
+    assert MEAN_WORDS.find("I love this frog") is None
+    assert MEAN_WORDS.find("what a badge") is None
+    assert MEAN_WORDS.find("that's unbadly done") is None
+    assert MEAN_WORDS.find("whatever!") is None
+    assert MEAN_WORDS.find("$5 for a hat") is None
+
+
+def test_wildcards_match_inside_words():
+    words = WordFilter(['*frog*'])
+    assert words.find("froggy") == '*frog*'
+    assert words.find("bullfrogs!") == '*frog*'
+
+
+def test_normalize_keeps_punctuation_outside_words():
+    assert normalize("Stupid!") == 'stupid!'
+    assert normalize("sh!t") == 'shit'
+    assert normalize("  a  b ") == 'a b'
+
+
+def test_guild_words():
+    engine = ModerationEngine(['badword1'])
+    engine.set_guild_words(1, ['pondscum'])
+    assert engine.find("you pondscum!", 1) == 'pondscum'
+    assert engine.find("you pondscum!", 2) is None
+    assert engine.find("badword1!", 1) == 'badword1'
+    engine.set_guild_words(1, None)
+    assert engine.find("you pondscum!", 1) is None
+
+
+def test_guild_words_are_checked_alongside_the_shared_filter():
+    engine = ModerationEngine(['badword1'])
+    engine.set_guild_words(1, ['pondscum'])
+    assert engine.find("pondscum", 1) == 'pondscum'
+    assert engine.find("badword1", 1) == 'badword1'
+
+    async def update():
+        await engine.update_guild_words(1, ['toadface'])
+    asyncio.run(update())
+    assert engine.find("toadface!", 1) == 'toadface'
+    assert engine.find("pondscum", 1) is None
+    assert engine.find("toadface", 2) is None
+
+
+def test_word_file_reload(tmp_path):
+    path = tmp_path / 'words.txt'
+    path.write_text("# comment\nswampy\n")
+    engine = ModerationEngine(['badword1'], path=str(path))
+    assert engine.find("so swampy") is None  # Not read until load()
+    engine.load()
+    engine.set_guild_words(1, ['pondscum'])
+    assert engine.find("so swampy") == 'swampy'
+
+    path.write_text("muddy\n")
+    os.utime(path, (time.time() + 10, time.time() + 10))
+    assert asyncio.run(engine.reload_if_changed())
+    assert engine.find("so swampy") is None
+    assert engine.find("so muddy", 1) == 'muddy'
+    assert engine.find("pondscum", 1) == 'pondscum'
+    assert not asyncio.run(engine.reload_if_changed())
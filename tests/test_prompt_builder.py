@@ -0,0 +1,36 @@
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from prompt_builder import PromptBuilder
+
+
+def test_summaries_only_get_newly_dropped_lines():
+    calls = []
+
+    async def summarize(previous, text):
+        calls.append((previous, text))
+        return f"summary {len(calls)}"
+
+    async def run():
+        builder = PromptBuilder("persona", token_budget=10, summarize=summarize)
+        history = []
+        for i in range(6):
+            history.append({'time': float(i), 'content': f"message number {i}", 'is_froggy': False})
+            builder.context((1, 1), history)
+            await asyncio.sleep(0)
+            await asyncio.gather(*builder._summarizing.values())
+        return calls
+
+    calls = asyncio.run(run())
+    assert len(calls) > 1
+    seen = set()
+    for previous, text in calls:
+        lines = text.splitlines()
+        assert lines
+        assert not seen & set(lines)  # Nothing is sent to the summarizer twice
+        seen.update(lines)
+    assert calls[0][0] == ""
+    assert calls[-1][0] == f"summary {len(calls) - 1}"
@@ -0,0 +1,52 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from response_cache import ResponseCache, normalize
+
+
+def test_greetings_share_an_entry():
+    cache = ResponseCache()
+    cache.put("<@123> hi froggy", "Ribbit! Hey there!")
+    assert cache.get("hey froggy!!") == "Ribbit! Hey there!"
+    assert cache.get("Hello   Froggy") == "Ribbit! Hey there!"
+    assert normalize("hey") == "hi"
+
+
+def test_different_questions_miss():
+    cache = ResponseCache()
+    pairs = [
+        ("i am happy today", "i am not happy today"),
+        ("do you like cats", "do you like rats"),
+        ("should i quit my job", "should i quit my gym"),
+        ("what time is it in tokyo", "what time is it in toronto"),
+    ]
+    for asked, reply in pairs:
+        cache.put(asked, f"reply to {asked}")
+    for asked, other in pairs:
+        assert cache.get(other) is None
+    assert cache.stats()['similar_hits'] == 0
+
+
+def test_similarity_is_off_without_an_embedding():
+    assert not ResponseCache().similarity
+
+
+def test_context_keeps_conversations_apart():
+    cache = ResponseCache()
+    cache.put("what do you think", "Sounds great!", context="talking about ponds")
+    assert cache.get("what do you think", context="talking about exams") is None
+    assert cache.get("what do you think", context="talking about ponds") == "Sounds great!"
+
+
+def test_similarity_layer_uses_the_given_embedding():
+    pytest.importorskip("numpy")
+    vectors = {"whats the weather like": [1.0, 0.0, 0.1], "how is the weather": [1.0, 0.0, 0.12], "tell me a joke": [0.0, 1.0, 0.0]}
+    cache = ResponseCache(embed=vectors.__getitem__)
+    cache.put("whats the weather like", "Rainy, perfect for frogs!")
+    assert cache.get("how is the weather") == "Rainy, perfect for frogs!"
+    assert cache.get("tell me a joke") is None
+    assert cache.stats()['similar_hits'] == 1